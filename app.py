@@ -1,31 +1,74 @@
 # app.py
 import streamlit as st
 from pathlib import Path
-import tempfile, uuid, os, json
+import json, time
 
-# utils (ensure these files exist as per previous instructions)
-from utils.gemini_utils import configure_gemini, gemini_generate
-from utils.extract_text import extract_text_from_path
-from utils.parser import parse_questions
-from utils.grader import grade_mcq_by_ai, grade_short_answer_by_ai
-from utils.crossword import build_crossword_from_text, grade_crossword_submission
+# Streamlit re-runs this script on every interaction: keep the top cheap.
+# Page config goes first so the shell renders while the rest loads; heavy
+# parsers and the Gemini SDK are imported on first use inside utils.
+st.set_page_config(page_title="Igris - Academic Portal", layout="wide")
+st.title("Igris — Academic Portal")
 
-# Configure Gemini (reads GEMINI_API_KEY from env or .env)
-configure_gemini()
+# utils (ensure these files exist as per previous instructions)
+from utils.gemini_utils import configure_gemini, prewarm_sdk
+from utils.parser import format_questions
+from utils.grader import grade_submission
+from utils.crossword import (grade_crossword_entries, crossword_for_student,
+                             clue_numbers, answers_to_grid, crossing_conflicts)
+from utils.catalog import (AssignmentCatalog, convert_legacy_assignment, new_assignment_meta,
+                           save_question_assignment, save_crossword_assignment)
+from utils.results import ResultsStore
+from utils.jobs import JobQueue, GENERATION_HANDLERS, ACTIVE_STATUSES
+from utils.telemetry import span, profiled
 
 # Assignments folder
 ASSIGN_FOLDER = Path("assignments")
-# If a file named 'assignments' exists, remove it or rename it before running.
-if ASSIGN_FOLDER.exists() and not ASSIGN_FOLDER.is_dir():
-    # If it's a file (not folder), rename it out of the way
-    try:
-        ASSIGN_FOLDER.rename("assignments_bak")
-    except Exception:
-        pass
-ASSIGN_FOLDER.mkdir(exist_ok=True)
+PAGE_SIZE = 25
+# Seconds between status checks while a generation job is running
+JOB_POLL_SECONDS = 1.0
 
-st.set_page_config(page_title="Igris - Academic Portal", layout="wide")
-st.title("Igris — Academic Portal")
+@st.cache_resource
+def init_gemini():
+    """
+    Configure Gemini once per process (reads GEMINI_API_KEY from env or .env)
+    and import the SDK in the background.
+    """
+    configure_gemini()
+    prewarm_sdk()
+    return True
+
+@st.cache_resource
+def init_storage():
+    """
+    Assignment catalog and results store, opened once per process.
+    """
+    # If a file named 'assignments' exists, remove it or rename it before running.
+    if ASSIGN_FOLDER.exists() and not ASSIGN_FOLDER.is_dir():
+        # If it's a file (not folder), rename it out of the way
+        try:
+            ASSIGN_FOLDER.rename("assignments_bak")
+        except Exception:
+            pass
+    ASSIGN_FOLDER.mkdir(exist_ok=True)
+    # Indexed metadata of saved assignments; imports pre-catalog files on first run
+    catalog = AssignmentCatalog(ASSIGN_FOLDER / "catalog.db")
+    catalog.import_folder(ASSIGN_FOLDER)
+    # Append-only submission log with per-assignment aggregates
+    results_store = ResultsStore(ASSIGN_FOLDER / "results.db")
+    results_store.import_folder(ASSIGN_FOLDER, batch_of=lambda aid: (catalog.get_assignment(aid) or {}).get("batch"))
+    return catalog, results_store
+
+@st.cache_resource
+def init_jobs():
+    """
+    Background generation queue shared by every session in this process.
+    """
+    return JobQueue(ASSIGN_FOLDER / "jobs.db", GENERATION_HANDLERS)
+
+init_gemini()
+catalog, results_store = init_storage()
+jobs = init_jobs()
+poll_job = False
 
 tabs = st.tabs(["Teacher", "Student", "Assignments"])
 
@@ -35,106 +78,151 @@ with tabs[0]:
     uploaded = st.file_uploader("Upload PDF / DOCX / PPTX", type=['pdf','docx','pptx'])
     q_type = st.selectbox("Question type", ["MCQ", "True/False", "Short Answer", "Numerical", "Coding", "Crossword"], index=0)
     num_q = st.number_input("Number of questions / words", min_value=1, max_value=30, value=8)
+    num_variants = 1
+    if q_type == "Crossword":
+        num_variants = st.number_input("Crossword layouts (one per student, picked from their ID)",
+                                       min_value=1, max_value=500, value=1)
     difficulty = st.selectbox("Difficulty", ["Easy", "Medium", "Hard"], index=1)
     batch_name = st.text_input("Assign to batch (name)", value="DS-2022-2023-B1")
+    topic = st.text_input("Focus topic (optional)", value="",
+                          help="Only use the parts of the document that match this topic.").strip() or None
+    reuse_cached = st.checkbox("Reuse questions already generated from this document", value=True,
+                               help="Serves questions from the question bank and cached replies first. "
+                                    "Untick to ask Gemini for a fresh set; questions already in the bank are still skipped.")
 
     if uploaded:
         st.write("Uploaded file:", uploaded.name)
-        tmp = tempfile.NamedTemporaryFile(delete=False, suffix=uploaded.name)
-        tmp.write(uploaded.getvalue())
-        tmp.flush()
-        tmp_path = tmp.name
 
         if st.button("Generate Questions / Crossword"):
-            with st.spinner("Extracting text and generating..."):
-                extracted_text = extract_text_from_path(tmp_path)
-                if q_type == "Crossword":
-                    cw = build_crossword_from_text(extracted_text, num_words=num_q, grid_size=15)
-                    st.session_state['latest_crossword'] = cw
-                    st.success("Crossword generated — preview below.")
-                    st.markdown("### Clues")
-                    for w in cw["words"]:
-                        st.write(f"- **{w}**: {cw['clues'].get(w,'')}")
-                    st.markdown("### Grid preview")
-                    st.code("\n".join(cw["grid"]), language=None)
-                else:
-                    prompt = f"""
-You are Igris. Generate exactly {num_q} {q_type} questions of {difficulty} difficulty from the context below.
-Return plain readable questions only, each formatted as:
-1. Question text
-A) option A
-B) option B
-C) option C
-D) option D
-Correct: B
-
-Context:
-{extracted_text[:3500]}
-"""
-                    raw = gemini_generate(prompt)
-                    st.session_state['latest_raw'] = raw
-                    st.success("Questions generated — preview below.")
-                    st.code(raw, language=None)
-
-        # cleanup tmp file (optional)
-        # os.remove(tmp_path)
+            # generation runs on the shared background pool; this session only polls
+            # the job, so reruns and reloads don't lose the work
+            job_id = jobs.submit("generate", {
+                "q_type": q_type,
+                "num_q": int(num_q),
+                "difficulty": difficulty,
+                "topic": topic,
+                "use_cache": reuse_cached,
+                "source_file": uploaded.name,
+                "mime": uploaded.type,
+                "num_variants": int(num_variants),
+            }, blob=uploaded.getvalue())
+            st.session_state['gen_job'] = job_id
+            st.query_params["job"] = job_id
+            st.session_state.pop('latest_questions', None)
+            st.session_state.pop('latest_crossword', None)
+
+    job_id = st.session_state.get('gen_job') or st.query_params.get("job")
+    job = jobs.get(job_id) if job_id else None
+    if job and job["status"] in ACTIVE_STATUSES:
+        st.info("Queued — waiting for a free worker..." if job["status"] == "queued" else "Extracting text and generating...")
+        st.progress(job["progress"])
+        # questions render as soon as each one is complete
+        if job["result"] and job["result"].get("questions"):
+            st.code(format_questions(job["result"]["questions"]), language=None)
+        poll_job = True
+    elif job and job["status"] == "failed":
+        st.error(f"Generation failed: {job['error']}")
+    elif job:
+        if st.session_state.get('loaded_job') != job["id"]:
+            st.session_state['loaded_job'] = job["id"]
+            st.session_state['latest_source'] = job["params"].get("source_file")
+            # the assignment is saved with the job's settings: after a reload
+            # (?job=...) the widgets are back at their defaults
+            st.session_state['latest_params'] = job["params"]
+            if "crossword" in job["result"]:
+                st.session_state['latest_crossword'] = job["result"]["crossword"]
+                st.session_state.pop('latest_questions', None)
+            else:
+                st.session_state['latest_questions'] = job["result"]["questions"]
+                st.session_state['latest_requested'] = job["result"].get("requested")
+                st.session_state.pop('latest_crossword', None)
+        if st.session_state.get('latest_crossword'):
+            cw = st.session_state['latest_crossword']
+            st.success("Crossword generated — preview below.")
+            st.markdown("### Clues")
+            for w in (p["word"] for p in cw["placed"]):
+                st.write(f"- **{w}**: {cw['clues'].get(w,'')}")
+            st.markdown("### Grid preview")
+            st.code("\n".join(cw["grid"]), language=None)
+            if cw.get("unused"):
+                st.warning(f"{len(cw['unused'])} word(s) didn't fit the grid and are left out of the puzzle: "
+                           + ", ".join(cw["unused"]))
+        elif st.session_state.get('latest_questions') is not None:
+            questions = st.session_state['latest_questions']
+            st.code(format_questions(questions), language=None)
+            st.success(f"{len(questions)} questions generated — preview above.")
+            requested = st.session_state.get('latest_requested')
+            if requested and len(questions) < requested:
+                st.warning(f"Only {len(questions)} of {requested} questions: the rest repeated questions already in "
+                           "the question bank or didn't parse. The assignment will be saved with "
+                           f"{len(questions)} questions.")
 
     # Save & assign
-    if st.session_state.get('latest_crossword') or st.session_state.get('latest_raw'):
+    if st.session_state.get('latest_crossword') or st.session_state.get('latest_questions') is not None:
         if st.button("Save & Assign to Batch"):
-            aid = uuid.uuid4().hex
+            source_file = st.session_state.get('latest_source')
+            job_params = st.session_state.get('latest_params', {})
+            job_difficulty = job_params.get("difficulty", difficulty)
             if st.session_state.get('latest_crossword'):
-                obj = {
-                    "meta": {
-                        "id": aid,
-                        "batch": batch_name,
-                        "q_type": "Crossword",
-                        "num_q": num_q,
-                        "difficulty": difficulty,
-                        "source_file": uploaded.name if uploaded else None
-                    },
-                    "crossword": st.session_state['latest_crossword']
-                }
-                out_path = ASSIGN_FOLDER / f"assignment_{aid}.crossword.json"
-                out_path.write_text(json.dumps(obj, indent=2), encoding="utf-8")
-                st.success(f"Crossword assignment saved: {out_path.name}")
+                meta = new_assignment_meta(batch_name, "Crossword", len(st.session_state['latest_crossword']["placed"]),
+                                           job_difficulty, source_file)
+                wanted = int(job_params.get("num_variants", num_variants))
+                with st.spinner(f"Building up to {wanted} layouts..."):
+                    out_path, layouts = save_crossword_assignment(catalog, ASSIGN_FOLDER, meta,
+                                                                  st.session_state['latest_crossword'], wanted)
+                st.success(f"Crossword assignment saved: {out_path.name} ({layouts} layout(s))")
+                if layouts < wanted:
+                    st.warning(f"Only {layouts} distinct layouts of these words could be built (asked for {wanted}); "
+                               "some students will share a layout.")
             else:
-                # save normal text assignment + meta
-                txt_path = ASSIGN_FOLDER / f"assignment_{aid}.txt"
-                meta_path = ASSIGN_FOLDER / f"assignment_{aid}.meta.json"
-                meta = {
-                    "id": aid,
-                    "batch": batch_name,
-                    "q_type": q_type,
-                    "num_q": num_q,
-                    "difficulty": difficulty,
-                    "source_file": uploaded.name if uploaded else None
-                }
-                txt_path.write_text(st.session_state['latest_raw'], encoding="utf-8")
-                meta_path.write_text(json.dumps(meta, indent=2), encoding="utf-8")
-                st.success(f"Assignment saved: {txt_path.name}")
+                # questions are parsed once here and saved as validated JSON
+                questions = st.session_state['latest_questions']
+                meta = new_assignment_meta(batch_name, job_params.get("q_type", q_type), len(questions),
+                                           job_difficulty, source_file)
+                out_path, errors, missing = save_question_assignment(catalog, ASSIGN_FOLDER, meta, questions)
+                if errors:
+                    st.error("Could not save: the generated questions did not parse cleanly. Regenerate and try again.")
+                    st.code("\n".join(errors), language=None)
+                else:
+                    if missing:
+                        st.warning(f"No answer key for {', '.join(missing)}; these will be graded by Gemini.")
+                    st.success(f"Assignment saved: {out_path.name}")
 
 ##### STUDENT TAB #####
 with tabs[1]:
     st.header("Student — Take Assignment")
-    files = sorted(list(ASSIGN_FOLDER.glob("assignment_*.txt")) + list(ASSIGN_FOLDER.glob("assignment_*.crossword.json")), key=lambda p: p.stat().st_mtime, reverse=True)
-    choices = [p.name for p in files]
+    s1, s2 = st.columns(2)
+    with s1:
+        student_batch = st.selectbox("Batch", ["All"] + catalog.distinct_values("batch"), key="student_batch")
+    with s2:
+        student_search = st.text_input("Search by source document", key="student_search").strip()
+    student_filters = {"batch": None if student_batch == "All" else student_batch, "search": student_search or None}
+    student_pages = max(1, (catalog.count_assignments(**student_filters) + PAGE_SIZE - 1) // PAGE_SIZE)
+    student_page = st.number_input(f"Page (of {student_pages})", min_value=1, max_value=student_pages, value=1,
+                                   key="student_page") if student_pages > 1 else 1
+    rows = catalog.list_assignments(limit=PAGE_SIZE, offset=(student_page - 1) * PAGE_SIZE, **student_filters)
+    rows_by_file = {row["file"]: row for row in rows}
+    choices = list(rows_by_file)
     chosen = st.selectbox("Select assignment", choices) if choices else None
+    student_id = st.text_input("Student ID / roll number", key="student_id").strip()
 
     if chosen and st.button("Load Assignment"):
         path = ASSIGN_FOLDER / chosen
+        st.session_state['assignment_row'] = rows_by_file[chosen]
         if chosen.endswith(".crossword.json"):
             obj = json.loads(path.read_text(encoding="utf-8"))
+            if obj['crossword'].get("variants") and not student_id:
+                st.warning("Enter your student ID first: this crossword has a layout per student.")
+                st.stop()
+            obj['crossword'] = crossword_for_student(obj['crossword'], student_id)
             st.session_state['crossword_obj'] = obj
             st.session_state['quiz_type'] = "Crossword"
-            # initialize student grid if not present
-            size = obj['crossword'].get("size", len(obj['crossword']['grid']))
-            if 'student_grid' not in st.session_state or len(st.session_state.get('student_grid', [])) != size:
-                st.session_state['student_grid'] = ["".join(["" for _ in range(size)]) for _ in range(size)]
         else:
-            content = path.read_text(encoding="utf-8")
-            st.session_state['quiz_text'] = content
-            st.session_state['parsed'] = parse_questions(content)
+            if chosen.endswith(".txt"):
+                # legacy text assignment: convert once to the structured format
+                path = convert_legacy_assignment(path)
+            obj = json.loads(path.read_text(encoding="utf-8"))
+            st.session_state['parsed'] = obj["questions"]
             st.session_state['quiz_type'] = "Regular"
 
     if st.session_state.get('quiz_type') == "Regular" and st.session_state.get('parsed'):
@@ -152,91 +240,114 @@ with tabs[1]:
             st.write("")
 
         if st.button("Submit & Grade"):
-            total_marks = 0.0
-            obtained = 0.0
-            for q in parsed:
-                qid = q['id']
-                max_marks = 1.0
-                total_marks += max_marks
-                resp = answers.get(qid, "")
-                if q.get('options'):
-                    score = grade_mcq_by_ai(q['question'], q['options'], resp)
-                else:
-                    score = grade_short_answer_by_ai("model answer not provided", resp, max_marks=1.0)
-                obtained += score
+            max_marks = 1.0
+            total_marks = max_marks * len(parsed)
+            progress = st.progress(0.0, text="Grading...")
+            with span("ui.grade", questions=len(parsed)), profiled("grade"):
+                scores = grade_submission(parsed, answers, max_marks=max_marks,
+                                          on_progress=lambda done, total: progress.progress(done / max(1, total), text=f"Graded {done}/{total}"))
+            obtained = sum(scores)
             st.success(f"Score: {obtained}/{total_marks}")
-            rid = uuid.uuid4().hex
-            res_path = ASSIGN_FOLDER / f"result_{rid}.json"
-            result_obj = {"id": rid, "assignment": chosen, "score": obtained, "total": total_marks}
-            res_path.write_text(json.dumps(result_obj, indent=2), encoding="utf-8")
+            row = st.session_state['assignment_row']
+            results_store.record_result(row["id"], obtained, total_marks, batch=row["batch"], student=student_id or None,
+                                        question_scores={q['id']: sc for q, sc in zip(parsed, scores)})
             st.write("Result saved.")
 
     if st.session_state.get('quiz_type') == "Crossword" and st.session_state.get('crossword_obj'):
         cwobj = st.session_state['crossword_obj']['crossword']
         size = cwobj.get("size", len(cwobj["grid"]))
-        grid = cwobj["grid"]
+        placed = cwobj.get("placed", [])
+        numbers = clue_numbers(placed)
 
+        # one input per word inside a form: typing doesn't rerun the script,
+        # and only answer cells are rendered
         st.markdown("#### Clues")
-        for w in cwobj["words"]:
-            st.write(f"- **{w}**: {cwobj['clues'].get(w,'')}")
-
-        st.markdown("#### Fill crossword (enter letters):")
-        student_grid = st.session_state['student_grid']
-        # Render grid as inputs
-        for r in range(size):
-            cols = st.columns(size)
-            row_chars = list(student_grid[r]) if student_grid[r] else [""]*size
-            for c in range(size):
-                val = row_chars[c] if c < len(row_chars) else ""
-                v = cols[c].text_input("", value=val, max_chars=1, key=f"cell_{r}_{c}")
-                row_chars[c] = (v or "").upper()
-            st.session_state['student_grid'][r] = "".join(row_chars)
-
-        if st.button("Submit Crossword"):
-            student_lines = st.session_state['student_grid']
-            sol_lines = cwobj['grid']
-            result = grade_crossword_submission(sol_lines, student_lines)
+        with st.form("crossword_form"):
+            entries = []
+            for i, (p, num) in enumerate(zip(placed, numbers)):
+                label = f"{num} {p['dir'].capitalize()} ({len(p['word'])}): {cwobj['clues'].get(p['word'], '')}"
+                entries.append(st.text_input(label, max_chars=len(p['word']), key=f"cw_word_{i}"))
+            submitted = st.form_submit_button("Submit Crossword")
+
+        student_lines = answers_to_grid(placed, entries, size)
+        with st.expander("Your grid"):
+            mask = [[" "] * size for _ in range(size)]
+            for p in placed:
+                for k in range(len(p["word"])):
+                    r, c = (p["row"], p["col"] + k) if p["dir"] == "across" else (p["row"] + k, p["col"])
+                    mask[r][c] = student_lines[r][c] if student_lines[r][c] != " " else "_"
+            st.code("\n".join(" ".join(row) for row in mask), language=None)
+            conflicts = crossing_conflicts(placed, entries)
+            if conflicts:
+                st.warning(f"{len(conflicts)} crossing cell(s) have different letters in the two words (shown as ?).")
+
+        if submitted:
+            # each word is graded against its own entry, so a wrong crossing
+            # word can't overwrite a right one
+            with span("ui.grade_crossword", words=len(placed)):
+                result = grade_crossword_entries(placed, entries)
             st.success(f"Crossword score: {result['correct_cells']}/{result['total_cells']} ({result['score_fraction']*100:.1f}%)")
-            rid = uuid.uuid4().hex
-            res_path = ASSIGN_FOLDER / f"result_{rid}.json"
-            result_obj = {"id": rid, "assignment": chosen, "score": result['score_fraction'], "correct_cells": result['correct_cells'], "total_cells": result['total_cells']}
-            res_path.write_text(json.dumps(result_obj, indent=2), encoding="utf-8")
+            row = st.session_state['assignment_row']
+            results_store.record_result(row["id"], result['correct_cells'], result['total_cells'], batch=row["batch"],
+                                        student=student_id or None,
+                                        question_scores={w: float(ok) for w, ok in result.get('words', {}).items()},
+                                        extra={"correct_cells": result['correct_cells'], "total_cells": result['total_cells']})
             st.write("Result saved.")
 
 ##### ASSIGNMENTS TAB #####
 with tabs[2]:
     st.header("Assignments & Results")
-    files = sorted(list(ASSIGN_FOLDER.glob("assignment_*.meta.json")) + list(ASSIGN_FOLDER.glob("assignment_*.crossword.json")), key=lambda p: p.stat().st_mtime, reverse=True)
-    if not files:
+    f1, f2, f3 = st.columns(3)
+    with f1:
+        f_batch = st.selectbox("Batch", ["All"] + catalog.distinct_values("batch"), key="list_batch")
+    with f2:
+        f_type = st.selectbox("Type", ["All"] + catalog.distinct_values("q_type"), key="list_type")
+    with f3:
+        f_difficulty = st.selectbox("Difficulty", ["All"] + catalog.distinct_values("difficulty"), key="list_difficulty")
+    filters = {
+        "batch": None if f_batch == "All" else f_batch,
+        "q_type": None if f_type == "All" else f_type,
+        "difficulty": None if f_difficulty == "All" else f_difficulty,
+    }
+    total = catalog.count_assignments(**filters)
+    if not total:
         st.info("No assignments saved yet.")
     else:
-        for meta_file in files:
-            try:
-                meta = json.loads(meta_file.read_text(encoding="utf-8"))
-            except Exception:
-                meta = {"id": meta_file.stem}
-            aid = meta.get("id", meta_file.stem)
-            # determine display name for crossword vs regular
-            display_name = meta_file.name
-            st.markdown(f"**{display_name}** — batch: {meta.get('batch')}, type: {meta.get('q_type')}, difficulty: {meta.get('difficulty')}")
+        pages = (total + PAGE_SIZE - 1) // PAGE_SIZE
+        page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1) if pages > 1 else 1
+        for row in catalog.list_assignments(limit=PAGE_SIZE, offset=(page - 1) * PAGE_SIZE, **filters):
+            aid = row["id"]
+            display_name = row["file"]
+            st.markdown(f"**{display_name}** — batch: {row['batch']}, type: {row['q_type']}, difficulty: {row['difficulty']}")
+            summary = results_store.assignment_summary(aid)
+            if summary["attempts"]:
+                with st.expander(f"Results: {summary['attempts']} submissions, average {summary['mean']*100:.1f}%"):
+                    st.write(f"Min {summary['min']*100:.1f}% · Max {summary['max']*100:.1f}% · Std dev {summary['stdev']*100:.1f}%")
+                    st.caption("Score distribution (bar n = n×10% to (n+1)×10%)")
+                    st.bar_chart({"submissions": summary["distribution"]})
+                    if summary["questions"]:
+                        st.markdown("Per-question correctness")
+                        st.table({"question": list(summary["questions"]),
+                                  "correct rate": [f"{v*100:.0f}%" for v in summary["questions"].values()]})
             col1, col2 = st.columns([1, 4])
             with col1:
                 if st.button(f"View {aid}", key=f"view_{aid}"):
-                    # find the matching assignment file
-                    # for crossword meta, content may be inside the same file; try to display
-                    candidate_txt = ASSIGN_FOLDER / f"assignment_{aid}.txt"
-                    candidate_cw = ASSIGN_FOLDER / f"assignment_{aid}.crossword.json"
-                    if candidate_txt.exists():
-                        content = candidate_txt.read_text(encoding="utf-8")
-                        st.text_area("Assignment content", content, height=300)
-                    elif candidate_cw.exists():
-                        cont = candidate_cw.read_text(encoding="utf-8")
-                        st.text_area("Assignment content (crossword json)", cont, height=300)
+                    path = ASSIGN_FOLDER / row["file"]
+                    if path.exists():
+                        content = path.read_text(encoding="utf-8")
+                        if row["file"].endswith(".crossword.json"):
+                            st.text_area("Assignment content (crossword json)", content, height=300)
+                        elif row["file"].endswith(".json"):
+                            st.text_area("Assignment content", format_questions(json.loads(content)["questions"]), height=300)
+                        else:
+                            st.text_area("Assignment content", content, height=300)
             with col2:
                 if st.button(f"Download {aid}", key=f"dl_{aid}"):
-                    candidate_txt = ASSIGN_FOLDER / f"assignment_{aid}.txt"
-                    candidate_cw = ASSIGN_FOLDER / f"assignment_{aid}.crossword.json"
-                    if candidate_txt.exists():
-                        st.download_button(label="Download assignment", data=candidate_txt.read_text(encoding="utf-8"), file_name=candidate_txt.name)
-                    elif candidate_cw.exists():
-                        st.download_button(label="Download assignment", data=candidate_cw.read_text(encoding="utf-8"), file_name=candidate_cw.name)
+                    path = ASSIGN_FOLDER / row["file"]
+                    if path.exists():
+                        st.download_button(label="Download assignment", data=path.read_text(encoding="utf-8"), file_name=path.name)
+
+# keep polling while this session's generation job is queued or running
+if poll_job:
+    time.sleep(JOB_POLL_SECONDS)
+    st.rerun()
@@ -0,0 +1,198 @@
+"""
+Crossword placement benchmark: the indexed backtracking engine in
+utils/crossword.try_place_words vs. the previous random-retry placer
+(kept below as legacy_try_place_words for comparison).
+
+    python -m benchmarks.bench_crossword [--trials 20] [--json out.json]
+"""
+import argparse
+import json
+import random
+import statistics
+import time
+from typing import Dict, List
+
+from utils.crossword import auto_grid_size, create_empty_grid, place_word, try_place_words
+
+SYLLABLES = ["ra", "to", "men", "ci", "al", "ter", "on", "si", "ne", "lo", "ga", "ri", "um", "pe", "ba", "di"]
+
+
+def synthetic_words(n: int, rng: random.Random) -> list:
+    words = set()
+    while len(words) < n:
+        words.add("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 5))).upper()[:15])
+    return sorted(words)
+
+
+def layout_stats(result: dict) -> dict:
+    """
+    Crossings and whether every placed word connects to the rest.
+    """
+    owner = {}
+    for i, p in enumerate(result["placed"]):
+        for k in range(len(p["word"])):
+            cell = (p["row"], p["col"] + k) if p["dir"] == "across" else (p["row"] + k, p["col"])
+            owner.setdefault(cell, []).append(i)
+    crossings = sum(1 for ids in owner.values() if len(ids) > 1)
+    links = {i: set() for i in range(len(result["placed"]))}
+    for ids in owner.values():
+        for i in ids:
+            links[i].update(ids)
+    seen, stack = set(), [0] if links else []
+    while stack:
+        i = stack.pop()
+        if i not in seen:
+            seen.add(i)
+            stack.extend(links[i] - seen)
+    return {"crossings": crossings, "connected": len(seen) == len(links)}
+
+
+# previous implementation, verbatim apart from the name
+def legacy_try_place_words(words: List[str], size=15, shuffle=True) -> Dict:
+    if shuffle:
+        words = sorted(words, key=lambda w: -len(w))
+    grid = create_empty_grid(size)
+    placed = []
+    unused = []
+
+    if words:
+        first = words[0]
+        r = size // 2
+        c = max(0, (size - len(first)) // 2)
+        if place_word(grid, first, r, c, "across"):
+            placed.append({"word": first, "row": r, "col": c, "dir": "across"})
+        else:
+            ok = False
+            for _ in range(200):
+                rr = random.randrange(size)
+                cc = random.randrange(size)
+                if place_word(grid, first, rr, cc, random.choice(["across","down"])):
+                    placed.append({"word": first, "row": rr, "col": cc, "dir": "across"})
+                    ok = True
+                    break
+            if not ok:
+                unused.append(first)
+
+    for w in words[1:]:
+        placed_flag = False
+        for attempt in range(200):
+            if not placed:
+                break
+            pw = random.choice(placed)
+            base_word = pw["word"]
+            possible_matches = []
+            for i,ch1 in enumerate(base_word):
+                for j,ch2 in enumerate(w):
+                    if ch1 == ch2:
+                        possible_matches.append((i,j))
+            if not possible_matches:
+                row = random.randrange(size)
+                col = random.randrange(size)
+                dirc = random.choice(["across","down"])
+                if place_word(grid,w,row,col,dirc):
+                    placed.append({"word": w, "row": row, "col": col, "dir": dirc})
+                    placed_flag = True
+                    break
+                continue
+            i,j = random.choice(possible_matches)
+            base_row = pw["row"]
+            base_col = pw["col"]
+            if pw["dir"] == "across":
+                target_row = base_row - j
+                target_col = base_col + i
+                if 0 <= target_row and target_row + len(w) <= size and 0 <= target_col < size:
+                    ok = True
+                    for k,ch in enumerate(w):
+                        cur = grid[target_row + k][target_col]
+                        if cur not in ("", ch):
+                            ok = False
+                            break
+                    if ok:
+                        for k,ch in enumerate(w):
+                            grid[target_row + k][target_col] = ch
+                        placed.append({"word": w, "row": target_row, "col": target_col, "dir": "down"})
+                        placed_flag = True
+                        break
+            else:
+                target_row = base_row + i
+                target_col = base_col - j
+                if 0 <= target_col and target_col + len(w) <= size and 0 <= target_row < size:
+                    ok = True
+                    for k,ch in enumerate(w):
+                        cur = grid[target_row][target_col + k]
+                        if cur not in ("", ch):
+                            ok = False
+                            break
+                    if ok:
+                        for k,ch in enumerate(w):
+                            grid[target_row][target_col + k] = ch
+                        placed.append({"word": w, "row": target_row, "col": target_col, "dir": "across"})
+                        placed_flag = True
+                        break
+        if not placed_flag:
+            for _ in range(200):
+                rr = random.randrange(size)
+                cc = random.randrange(size)
+                dirc = random.choice(["across","down"])
+                if place_word(grid,w,rr,cc,dirc):
+                    placed.append({"word": w, "row": rr, "col": cc, "dir": dirc})
+                    placed_flag = True
+                    break
+        if not placed_flag:
+            unused.append(w)
+
+    for r in range(size):
+        for c in range(size):
+            if grid[r][c] == "":
+                grid[r][c] = random.choice("ABCDEFGHIJKLMNOPQRSTUVWXYZ")
+
+    grid_lines = ["".join(row) for row in grid]
+    return {"grid": grid_lines, "placed": placed, "unused": unused}
+
+
+def run(word_counts, trials: int) -> list:
+    rows = []
+    for n in word_counts:
+        for name, fn in (("legacy", legacy_try_place_words), ("engine", try_place_words)):
+            times, rates, crossings, connected = [], [], [], 0
+            for t in range(trials):
+                words = synthetic_words(n, random.Random(t))
+                size = auto_grid_size(words)
+                random.seed(t)
+                kwargs = {"seed": t} if fn is try_place_words else {}
+                start = time.perf_counter()
+                result = fn(words, size=size, **kwargs)
+                times.append(time.perf_counter() - start)
+                rates.append(len(result["placed"]) / n)
+                stats = layout_stats(result)
+                crossings.append(stats["crossings"])
+                connected += stats["connected"]
+            rows.append({
+                "impl": name,
+                "words": n,
+                "placement_rate": statistics.mean(rates),
+                "crossings": statistics.mean(crossings),
+                "connected_fraction": connected / trials,
+                "median_ms": statistics.median(times) * 1000,
+            })
+    return rows
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--words", type=int, nargs="+", default=[10, 20, 30, 40, 50])
+    ap.add_argument("--trials", type=int, default=20)
+    ap.add_argument("--json", help="write results to this file")
+    args = ap.parse_args()
+    rows = run(args.words, args.trials)
+    print(f"{'impl':<8}{'words':>6}{'placed':>9}{'cross':>8}{'connected':>11}{'ms':>9}")
+    for r in rows:
+        print(f"{r['impl']:<8}{r['words']:>6}{r['placement_rate']:>9.1%}{r['crossings']:>8.1f}"
+              f"{r['connected_fraction']:>11.0%}{r['median_ms']:>9.2f}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+"""
+Benchmark suite for the hot paths on synthetic corpora: text extraction,
+quiz parsing, crossword placement and grading, and the end-to-end grading
+loop against a fake LLM backend.
+
+    python -m benchmarks.bench_suite [--stages extract parse ...] [--quick]
+                                     [--llm-latency 0.2] [--json out.json]
+
+The JSON output has one row per (stage, case) with timings in milliseconds,
+plus run metadata, so two files can be diffed across releases.
+"""
+import os
+
+# keep benchmark runs out of the on-disk response and extraction caches
+os.environ.setdefault("GEMINI_CACHE", "0")
+
+import argparse
+import json
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from benchmarks.bench_crossword import synthetic_words
+from benchmarks.corpora import WRITERS, synthetic_paragraphs, synthetic_quiz_output
+from utils.crossword import (auto_grid_size, grade_crossword_batch, grade_crossword_entries,
+                             grade_crossword_submission, try_place_words, word_cells)
+from utils.extract_text import extract_text_from_path
+from utils.gemini_utils import FakeBackend, LLMClient, set_client
+from utils.grader import grade_submission
+from utils.parser import parse_questions, parse_questions_fast
+
+
+def timed(fn, repeat: int) -> dict:
+    """
+    Run fn repeat times; return median/min/p95 wall time in ms and the last result.
+    """
+    times, result = [], None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append((time.perf_counter() - start) * 1000)
+    times.sort()
+    return {
+        "runs": repeat,
+        "median_ms": statistics.median(times),
+        "min_ms": times[0],
+        "p95_ms": times[min(len(times) - 1, int(round(0.95 * (len(times) - 1))))],
+        "result": result,
+    }
+
+
+def row(stage: str, case: str, timing: dict, **extra) -> dict:
+    out = {"stage": stage, "case": case}
+    out.update({k: v for k, v in timing.items() if k != "result"})
+    out.update(extra)
+    return out
+
+
+def bench_extract(sizes, repeat: int) -> list:
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for words in sizes:
+            paragraphs = synthetic_paragraphs(words, random.Random(words))
+            for ext, write in WRITERS.items():
+                path = os.path.join(tmp, f"doc_{words}.{ext}")
+                write(path, paragraphs)
+                t = timed(lambda: extract_text_from_path(path, use_cache=False), repeat)
+                rows.append(row("extract", f"{ext}-{words}w", t, file_bytes=os.path.getsize(path),
+                                chars=len(t["result"])))
+    return rows
+
+
+def bench_parse(sizes, repeat: int) -> list:
+    rows = []
+    for n in sizes:
+        text = synthetic_quiz_output(n, random.Random(n))
+        for name, fn in (("parse_questions", parse_questions), ("parse_questions_fast", parse_questions_fast)):
+            t = timed(lambda: fn(text), repeat)
+            rows.append(row("parse", f"{name}-{n}q", t, chars=len(text), questions=len(t["result"])))
+    return rows
+
+
+def bench_place(word_counts, grid_sizes, repeat: int) -> list:
+    rows = []
+    for n in word_counts:
+        words = synthetic_words(n, random.Random(n))
+        for size in grid_sizes or [auto_grid_size(words)]:
+            t = timed(lambda: try_place_words(words, size=size, seed=0), repeat)
+            rows.append(row("place", f"{n}w-{size}x{size}", t, words=n, size=size,
+                            placed=len(t["result"]["placed"])))
+    return rows
+
+
+def _submissions(placed, solution, count, rng):
+    """
+    Student grids with a fraction of answer cells wrong.
+    """
+    cells = [(p["row"] + (k if p["dir"] == "down" else 0), p["col"] + (k if p["dir"] == "across" else 0))
+             for p in placed for k in range(len(p["word"]))]
+    subs = []
+    for _ in range(count):
+        grid = [list(line) for line in solution]
+        for r, c in rng.sample(cells, len(cells) // 5):
+            grid[r][c] = "X" if grid[r][c] != "X" else "Y"
+        subs.append(["".join(line) for line in grid])
+    return subs
+
+
+def bench_grade_crossword(word_counts, batch: int, repeat: int) -> list:
+    rows = []
+    for n in word_counts:
+        words = synthetic_words(n, random.Random(n))
+        result = try_place_words(words, size=auto_grid_size(words), seed=0)
+        solution, placed = result["grid"], result["placed"]
+        subs = _submissions(placed, solution, batch, random.Random(n))
+        t = timed(lambda: grade_crossword_submission(solution, subs[0], placed=placed), repeat)
+        rows.append(row("grade_crossword", f"single-{n}w", t, words=n))
+        entries = ["".join(subs[0][r][c] for r, c in word_cells(p)) for p in placed]
+        t = timed(lambda: grade_crossword_entries(placed, entries), repeat)
+        rows.append(row("grade_crossword", f"entries-{n}w", t, words=n))
+        t = timed(lambda: grade_crossword_batch(solution, placed, subs), repeat)
+        rows.append(row("grade_crossword", f"batch{batch}-{n}w", t, words=n, submissions=batch,
+                        per_submission_ms=t["median_ms"] / batch))
+    return rows
+
+
+def synthetic_assignment(num_q: int, rng: random.Random) -> tuple:
+    """
+    Mixed assignment plus one submission: keyed MCQs, key-less MCQs and
+    short answers, so every grading path is exercised.
+    """
+    questions, answers = [], {}
+    for i in range(1, num_q + 1):
+        qid = f"q{i}"
+        kind = i % 3
+        if kind == 0:
+            q = {"id": qid, "question": f"Question {i}?", "options": ["A) a", "B) b", "C) c", "D) d"], "answer": "B"}
+            answers[qid] = rng.choice(q["options"])
+        elif kind == 1:
+            q = {"id": qid, "question": f"Question {i}?", "options": ["A) a", "B) b", "C) c", "D) d"], "answer": None}
+            answers[qid] = rng.choice(q["options"])
+        else:
+            q = {"id": qid, "question": f"Explain item {i}.", "options": None,
+                 "answer": "enzyme lowers activation energy"}
+            answers[qid] = "the enzyme reduces the activation energy"
+        questions.append(q)
+    return questions, answers
+
+
+def bench_grading(question_counts, latencies, repeat: int) -> list:
+    rows = []
+    try:
+        for latency in latencies:
+            for n in question_counts:
+                backend = FakeBackend(latency=latency)
+                set_client(LLMClient(backend, rpm=1e6, burst=10 ** 6, max_concurrency=64))
+                questions, answers = synthetic_assignment(n, random.Random(n))
+                t = timed(lambda: grade_submission(questions, answers), repeat)
+                rows.append(row("grading", f"{n}q-latency{latency}", t, questions=n, llm_latency_s=latency,
+                                llm_calls_per_submission=backend.calls / repeat))
+    finally:
+        set_client(None)
+    return rows
+
+
+def run_metadata() -> dict:
+    try:
+        rev = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                             check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        rev = None
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git_rev": rev,
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+STAGES = ("extract", "parse", "place", "grade_crossword", "grading")
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES))
+    ap.add_argument("--quick", action="store_true", help="smaller corpora and fewer repeats")
+    ap.add_argument("--repeat", type=int, help="timed runs per case")
+    ap.add_argument("--llm-latency", type=float, nargs="+", default=[0.0, 0.2],
+                    help="fake LLM latency per call in seconds")
+    ap.add_argument("--json", help="write results to this file")
+    args = ap.parse_args()
+
+    repeat = args.repeat or (3 if args.quick else 10)
+    doc_sizes = [2_000, 20_000] if args.quick else [2_000, 20_000, 100_000]
+    quiz_sizes = [50, 500] if args.quick else [50, 500, 5_000]
+    word_counts = [10, 30] if args.quick else [10, 20, 30, 50]
+    grid_sizes = [None] if args.quick else [None, 15, 25]
+
+    rows = []
+    if "extract" in args.stages:
+        rows += bench_extract(doc_sizes, max(1, repeat // 3))
+    if "parse" in args.stages:
+        rows += bench_parse(quiz_sizes, repeat)
+    if "place" in args.stages:
+        for size in grid_sizes:
+            rows += bench_place(word_counts, [size] if size else None, repeat)
+    if "grade_crossword" in args.stages:
+        rows += bench_grade_crossword(word_counts, 200, repeat)
+    if "grading" in args.stages:
+        rows += bench_grading([10, 40], args.llm_latency, max(1, repeat // 3))
+
+    print(f"{'stage':<16}{'case':<34}{'median ms':>11}{'p95 ms':>10}")
+    for r in rows:
+        print(f"{r['stage']:<16}{r['case']:<34}{r['median_ms']:>11.2f}{r['p95_ms']:>10.2f}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"meta": run_metadata(), "results": rows}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
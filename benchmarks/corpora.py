@@ -0,0 +1,123 @@
+"""
+Synthetic corpora for the benchmarks: lecture-like prose, PDF/DOCX/PPTX files
+built from it, and quiz text shaped like the model's output. Everything is
+seeded so runs are comparable across releases.
+"""
+import random
+from typing import List
+
+VOCAB = (
+    "cell membrane protein enzyme energy reaction molecule structure function system process "
+    "transport diffusion osmosis gradient receptor signal pathway gene expression mutation "
+    "theory experiment result analysis model equation variable constant pressure volume "
+    "temperature entropy equilibrium catalyst substrate product inhibitor concentration rate"
+).split()
+
+
+def synthetic_paragraphs(num_words: int, rng: random.Random, words_per_paragraph: int = 120) -> List[str]:
+    paragraphs = []
+    remaining = num_words
+    while remaining > 0:
+        n = min(words_per_paragraph, remaining)
+        sentences, words = [], [rng.choice(VOCAB) for _ in range(n)]
+        for i in range(0, n, 12):
+            sentence = " ".join(words[i:i + 12])
+            sentences.append(sentence[:1].upper() + sentence[1:] + ".")
+        paragraphs.append(" ".join(sentences))
+        remaining -= n
+    return paragraphs
+
+
+def _pdf_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pdf(path: str, paragraphs: List[str], lines_per_page: int = 45, chars_per_line: int = 90) -> None:
+    """
+    Minimal single-font PDF writer (no extra dependency), enough for PyPDF2
+    to extract the text back page by page.
+    """
+    lines = []
+    for p in paragraphs:
+        for i in range(0, len(p), chars_per_line):
+            lines.append(p[i:i + chars_per_line])
+    pages = [lines[i:i + lines_per_page] for i in range(0, len(lines), lines_per_page)] or [[]]
+
+    objects = []  # bodies of objects 1..n
+    font_id = 3
+    page_ids = []
+    objects.append(None)  # 1: catalog, filled below
+    objects.append(None)  # 2: pages, filled below
+    objects.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    for page in pages:
+        ops = ["BT", "/F1 10 Tf", "14 TL", "50 790 Td"]
+        ops += [f"({_pdf_escape(line)}) Tj T*" for line in page]
+        ops.append("ET")
+        stream = "\n".join(ops).encode("latin-1", "replace")
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        content_id = len(objects)
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                       b"/Resources << /Font << /F1 %d 0 R >> >> /Contents %d 0 R >>" % (font_id, content_id))
+        page_ids.append(len(objects))
+    objects[0] = b"<< /Type /Catalog /Pages 2 0 R >>"
+    kids = " ".join(f"{i} 0 R" for i in page_ids).encode()
+    objects[1] = b"<< /Type /Pages /Kids [" + kids + b"] /Count %d >>" % len(page_ids)
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for i, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % i + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for off in offsets:
+        out += b"%010d 00000 n \n" % off
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+def write_docx(path: str, paragraphs: List[str]) -> None:
+    import docx
+    document = docx.Document()
+    for p in paragraphs:
+        document.add_paragraph(p)
+    document.save(path)
+
+
+def write_pptx(path: str, paragraphs: List[str], paragraphs_per_slide: int = 2) -> None:
+    from pptx import Presentation
+    from pptx.util import Inches
+    prs = Presentation()
+    layout = prs.slide_layouts[6]  # blank
+    for i in range(0, len(paragraphs), paragraphs_per_slide):
+        slide = prs.slides.add_slide(layout)
+        box = slide.shapes.add_textbox(Inches(0.5), Inches(0.5), Inches(9), Inches(6))
+        box.text_frame.text = "\n".join(paragraphs[i:i + paragraphs_per_slide])
+    prs.save(path)
+
+
+WRITERS = {"pdf": write_pdf, "docx": write_docx, "pptx": write_pptx}
+
+
+def synthetic_quiz_output(num_questions: int, rng: random.Random) -> str:
+    """
+    Model-style quiz text: numbered MCQs, true/false and short-answer items,
+    mixing "Correct:" lines with inline "(Correct: X)" markers.
+    """
+    blocks = []
+    for i in range(1, num_questions + 1):
+        stem = " ".join(rng.choice(VOCAB) for _ in range(rng.randint(8, 20)))
+        kind = rng.random()
+        if kind < 0.6:
+            options = [" ".join(rng.choice(VOCAB) for _ in range(rng.randint(1, 4))) for _ in range(4)]
+            letter = rng.choice("ABCD")
+            lines = [f"{i}. What is the role of {stem}?"] + [f"{l}) {o}" for l, o in zip("ABCD", options)]
+            lines.append(f"Correct: {letter}" if rng.random() < 0.7 else f"(Correct: {letter})")
+        elif kind < 0.8:
+            lines = [f"{i}. True or False: {stem}.", "A) True", "B) False", f"Correct: {rng.choice('AB')}"]
+        else:
+            answer = " ".join(rng.choice(VOCAB) for _ in range(rng.randint(3, 10)))
+            lines = [f"{i}. Explain {stem}.", f"Correct: {answer}"]
+        blocks.append("\n".join(lines))
+    return "\n\n".join(blocks)
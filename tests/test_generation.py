@@ -0,0 +1,23 @@
+from utils.generation import dedupe_questions
+
+def mcq(stem, *options):
+    return {"question": stem, "options": [f"{letter}) {o}" for letter, o in zip("ABCD", options)]}
+
+def test_formulaic_stems_with_different_options_are_kept():
+    questions = [
+        mcq("Which of the following statements about osmosis is correct?",
+            "Water moves toward higher solute concentration", "It needs ATP", "It only occurs in plants", "None"),
+        mcq("Which of the following statements about diffusion is correct?",
+            "Particles move down a concentration gradient", "It requires a membrane pump",
+            "It stops at equilibrium temperature", "It is faster in solids"),
+    ]
+    assert len(dedupe_questions(questions)) == 2
+
+def test_repeated_question_is_dropped():
+    q = mcq("What is the powerhouse of the cell?", "Nucleus", "Mitochondria", "Ribosome", "Golgi body")
+    assert dedupe_questions([q, dict(q)]) == [q]
+
+def test_limit():
+    questions = [mcq(f"Question about topic {w}?", w, w + "s", w + "ed", w + "ing")
+                 for w in ("alpha", "beta", "gamma")]
+    assert len(dedupe_questions(questions, limit=2)) == 2
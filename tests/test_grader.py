@@ -0,0 +1,51 @@
+import pytest
+from utils import grader
+from utils.grader import grade_by_answer_key, grade_mcq_by_ai, grade_submission
+from utils.parser import resolve_answer_key
+
+OPTIONS = ["A) True", "B) False"]
+
+@pytest.fixture
+def gemini_reply(monkeypatch):
+    def set_reply(reply):
+        monkeypatch.setattr(grader, "gemini_generate", lambda prompt, **kwargs: reply)
+    return set_reply
+
+@pytest.mark.parametrize("reply, expected", [
+    ("CORRECT", 1.0), ("Correct.", 1.0), ("**CORRECT**", 1.0),
+    ("INCORRECT", 0.0), ("Incorrect - the correct answer is B", 0.0), ("", 0.0),
+])
+def test_mcq_reply_reading(gemini_reply, reply, expected):
+    gemini_reply(reply)
+    assert grade_mcq_by_ai("Water boils at 100 C at sea level.", OPTIONS, "B") == expected
+
+def test_keyless_mcq_marked_incorrect_gets_no_marks(gemini_reply):
+    gemini_reply("INCORRECT")
+    questions = [{"id": "q1", "question": "Pick one", "options": OPTIONS}]
+    assert grade_submission(questions, {"q1": "A"}) == [0.0]
+
+def test_resolve_answer_key():
+    assert resolve_answer_key("B", OPTIONS) == "B"
+    assert resolve_answer_key("True", OPTIONS) == "A"
+    assert resolve_answer_key("false.", OPTIONS) == "B"
+    assert resolve_answer_key("Maybe", OPTIONS) is None
+    assert resolve_answer_key("Osmosis", None) == "Osmosis"
+
+def test_grade_by_answer_key_letter():
+    q = {"question": "Pick one", "options": OPTIONS, "answer": "A"}
+    assert grade_by_answer_key(q, "A", max_marks=2.0) == 2.0
+    assert grade_by_answer_key(q, "B", max_marks=2.0) == 0.0
+
+def test_grade_by_answer_key_option_text():
+    q = {"question": "Pick one", "options": OPTIONS, "answer": resolve_answer_key("False", OPTIONS)}
+    assert grade_by_answer_key(q, "B) False") == 1.0
+    assert grade_by_answer_key(q, "A") == 0.0
+
+def test_grade_by_answer_key_without_options():
+    q = {"question": "The sky is blue.", "options": None, "answer": "True"}
+    assert grade_by_answer_key(q, "true") == 1.0
+    assert grade_by_answer_key(q, "False") == 0.0
+
+def test_keyless_question_falls_back_to_gemini():
+    q = {"question": "Pick one", "options": OPTIONS, "answer": None}
+    assert grade_by_answer_key(q, "A") is None
@@ -0,0 +1,28 @@
+import random
+import pytest
+from benchmarks.corpora import synthetic_quiz_output
+from utils.parser import parse_questions, parse_questions_fast
+
+ANSWER_FORMATS = [
+    ("1. Is water wet?\nA) True\nB) False\n(Correct: A)", "A"),
+    ("1. Pick one\nA) x\nB) y\nC) z\nD) w\n**Answer:** D", "D"),
+    ("1. The sky is blue\nA) True\nB) False\nCorrect answer: A) True", "A"),
+    ("1. Explain osmosis.\nAnswer: Movement of water across a membrane.", "Movement of water across a membrane."),
+]
+
+@pytest.mark.parametrize("seed", range(5))
+def test_fast_parser_matches_on_synthetic_quiz(seed):
+    text = synthetic_quiz_output(40, random.Random(seed))
+    questions = parse_questions(text)
+    assert len(questions) == 40
+    assert parse_questions_fast(text) == questions
+
+@pytest.mark.parametrize("text, answer", ANSWER_FORMATS)
+def test_fast_parser_matches_on_answer_formats(text, answer):
+    questions = parse_questions(text)
+    assert questions[0]["answer"] == answer
+    assert parse_questions_fast(text) == questions
+
+def test_fast_parser_matches_on_several_questions():
+    text = "\n\n".join(t.replace("1.", f"{i}.", 1) for i, (t, _) in enumerate(ANSWER_FORMATS, start=1))
+    assert parse_questions_fast(text) == parse_questions(text)
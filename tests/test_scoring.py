@@ -0,0 +1,41 @@
+from utils.scoring import ShortAnswerScorer, parse_numbers, terms
+
+def score(model, student, q_type=None):
+    return ShortAnswerScorer([model]).score(model, student, 1.0, q_type)
+
+def test_verbatim_answer_is_confident_match():
+    assert score("Mitochondria", "mitochondria") == (1.0, True)
+
+def test_empty_answer_is_confident_miss():
+    assert score("Mitochondria", "  ") == (0.0, True)
+
+def test_negation_is_a_term():
+    assert "not" in terms("It is not a prime")
+    assert "not" in terms("It isn't a prime")
+
+def test_negated_answer_is_not_confident():
+    _, confident = score("Water boils at a lower temperature at altitude",
+                         "Water does not boil at a lower temperature at altitude")
+    assert not confident
+
+def test_fractions_and_percentages_parse():
+    assert parse_numbers("3/4") == [0.75]
+    assert parse_numbers("75%") == [0.75]
+    assert parse_numbers("1,200.5 m") == [1200.5]
+
+def test_fraction_matches_decimal():
+    assert score("3/4", "0.75", "Numerical") == (1.0, True)
+    assert score("0.75", "3/4", "Numerical") == (1.0, True)
+
+def test_percent_mismatch_is_escalated():
+    assert score("75%", "75", "Numerical") == (0.0, False)
+
+def test_wrong_number_is_confident_miss():
+    assert score("42", "17", "Numerical") == (0.0, True)
+
+def test_paraphrase_is_escalated():
+    assert not score("Mitochondria", "The powerhouse of the cell")[1]
+    assert not score("Newton's second law", "F = ma")[1]
+
+def test_variant_spelling_is_escalated():
+    assert not score("Mitochondrion", "It's the mitochondria")[1]
@@ -0,0 +1,136 @@
+# utils/cache.py
+import os
+import json
+import time
+import hashlib
+import tempfile
+import threading
+from pathlib import Path
+
+# Root folder for on-disk caches (Gemini responses, extracted text, ...)
+CACHE_DIR = Path(os.environ.get("IGRIS_CACHE_DIR", ".cache"))
+
+class DiskCache:
+    """
+    Small content-addressed JSON cache stored as one file per entry.
+    Entries expire ttl_seconds (if set) after they were written, however often
+    they are read; when the cache grows past max_entries or max_bytes the
+    least recently used entries are evicted (a hit refreshes the entry's
+    mtime, which only orders eviction). Safe to share between threads.
+    """
+
+    def __init__(self, directory, max_entries: int = 2000, max_bytes: int | None = None,
+                 ttl_seconds: float | None = None):
+        self.directory = Path(directory)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries = None
+        self._bytes = None
+
+    @staticmethod
+    def make_key(*parts) -> str:
+        """
+        SHA-256 of the JSON encoding of parts (dicts are key-sorted).
+        """
+        blob = json.dumps(parts, sort_keys=True, default=str, ensure_ascii=False)
+        return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.json"
+
+    def get(self, key: str):
+        """
+        Return the cached value or None on a miss / expired entry.
+        """
+        path = self._path(key)
+        try:
+            entry = json.loads(path.read_text(encoding="utf-8"))
+            if self.ttl_seconds is not None and time.time() - entry["created"] > self.ttl_seconds:
+                self._remove(path)
+                raise FileNotFoundError(path)
+            value = entry["value"]
+            os.utime(path)
+        except (OSError, ValueError, KeyError):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return value
+
+    def set(self, key: str, value) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self._path(key)
+        data = json.dumps({"created": time.time(), "value": value}, ensure_ascii=False).encode("utf-8")
+        with self._lock:
+            self._load_usage()
+            try:
+                old_size = path.stat().st_size
+            except OSError:
+                old_size = None
+            fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+            if old_size is None:
+                self._entries += 1
+            else:
+                self._bytes -= old_size
+            self._bytes += len(data)
+            if self._entries > self.max_entries or (self.max_bytes is not None and self._bytes > self.max_bytes):
+                self._evict()
+
+    def _remove(self, path: Path) -> None:
+        try:
+            path.unlink()
+        except OSError:
+            pass
+
+    def _scan(self) -> list:
+        files = []
+        for p in self.directory.glob("*.json"):
+            try:
+                st = p.stat()
+            except OSError:
+                continue
+            files.append((st.st_mtime, st.st_size, p))
+        return files
+
+    def _load_usage(self) -> None:
+        if self._entries is None:
+            files = self._scan()
+            self._entries = len(files)
+            self._bytes = sum(size for _, size, _ in files)
+
+    def _evict(self) -> None:
+        # trim to 90% of the limits so eviction doesn't run on every write
+        files = sorted(self._scan())
+        entries = len(files)
+        total = sum(size for _, size, _ in files)
+        max_entries = int(self.max_entries * 0.9)
+        max_bytes = int(self.max_bytes * 0.9) if self.max_bytes is not None else None
+        for _, size, p in files:
+            if entries <= max_entries and (max_bytes is None or total <= max_bytes):
+                break
+            self._remove(p)
+            entries -= 1
+            total -= size
+        self._entries = entries
+        self._bytes = total
+
+    def clear(self) -> None:
+        with self._lock:
+            for _, _, p in self._scan():
+                self._remove(p)
+            self._entries = 0
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._load_usage()
+            return {"hits": self.hits, "misses": self.misses,
+                    "entries": self._entries, "bytes": self._bytes}
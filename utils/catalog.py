@@ -0,0 +1,303 @@
+# utils/catalog.py
+import os
+import json
+import time
+import tempfile
+import uuid
+import sqlite3
+from pathlib import Path
+from .parser import parse_questions_fast, validate_assignment, missing_answer_keys
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS assignments (
+    id TEXT PRIMARY KEY,
+    file TEXT NOT NULL,
+    batch TEXT,
+    q_type TEXT,
+    difficulty TEXT,
+    num_q INTEGER,
+    source_file TEXT,
+    created REAL NOT NULL,
+    meta TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_assignments_created ON assignments (created DESC);
+CREATE INDEX IF NOT EXISTS idx_assignments_batch ON assignments (batch, created DESC);
+CREATE INDEX IF NOT EXISTS idx_assignments_type ON assignments (q_type, created DESC);
+CREATE INDEX IF NOT EXISTS idx_assignments_difficulty ON assignments (difficulty, created DESC);
+CREATE TABLE IF NOT EXISTS catalog_state (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+class AssignmentCatalog:
+    """
+    SQLite index of saved assignments so list views don't glob and json-parse
+    the assignments folder on every rerun. The assignment files stay the
+    source of content; the catalog only holds their metadata.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = str(db_path)
+        Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        # one short-lived connection per operation keeps this safe across Streamlit threads
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    @staticmethod
+    def _row_values(meta: dict, file_name: str, created: float) -> tuple:
+        return (meta["id"], file_name, meta.get("batch"), meta.get("q_type"), meta.get("difficulty"),
+                meta.get("num_q"), meta.get("source_file"), created, json.dumps(meta))
+
+    def add_assignment(self, meta: dict, file_name: str, write=None, created: float | None = None) -> None:
+        """
+        Insert an assignment row and, inside the same transaction, call write()
+        to put its files on disk; if write raises, the row is rolled back.
+        """
+        created = created if created is not None else meta.get("created", time.time())
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute("INSERT INTO assignments VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                             self._row_values(meta, file_name, created))
+                if write is not None:
+                    write()
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _filters(batch=None, q_type=None, difficulty=None, since=None, search=None) -> tuple:
+        clauses, params = [], []
+        for column, value in (("batch", batch), ("q_type", q_type), ("difficulty", difficulty)):
+            if value:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if since is not None:
+            clauses.append("created >= ?")
+            params.append(since)
+        if search:
+            # case-insensitive substring of the source document or file name
+            pattern = "%" + search.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+            clauses.append("(source_file LIKE ? ESCAPE '\\' OR file LIKE ? ESCAPE '\\')")
+            params += [pattern, pattern]
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        return where, params
+
+    def list_assignments(self, batch: str | None = None, q_type: str | None = None,
+                         difficulty: str | None = None, since: float | None = None,
+                         limit: int = 50, offset: int = 0, search: str | None = None) -> list:
+        """
+        Newest-first page of assignment rows (dicts with the indexed columns
+        plus the stored "meta"). search matches the source or file name.
+        """
+        where, params = self._filters(batch, q_type, difficulty, since, search)
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                f"SELECT * FROM assignments {where} ORDER BY created DESC LIMIT ? OFFSET ?",
+                params + [limit, offset]).fetchall()
+        finally:
+            conn.close()
+        out = []
+        for row in rows:
+            item = dict(row)
+            item["meta"] = json.loads(item["meta"])
+            out.append(item)
+        return out
+
+    def count_assignments(self, batch: str | None = None, q_type: str | None = None,
+                          difficulty: str | None = None, since: float | None = None,
+                          search: str | None = None) -> int:
+        where, params = self._filters(batch, q_type, difficulty, since, search)
+        conn = self._connect()
+        try:
+            return conn.execute(f"SELECT COUNT(*) FROM assignments {where}", params).fetchone()[0]
+        finally:
+            conn.close()
+
+    def distinct_values(self, column: str) -> list:
+        if column not in ("batch", "q_type", "difficulty"):
+            raise ValueError(f"Unknown catalog column: {column}")
+        conn = self._connect()
+        try:
+            rows = conn.execute(f"SELECT DISTINCT {column} FROM assignments WHERE {column} IS NOT NULL ORDER BY {column}").fetchall()
+        finally:
+            conn.close()
+        return [r[0] for r in rows]
+
+    def get_assignment(self, aid: str) -> dict | None:
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT * FROM assignments WHERE id = ?", (aid,)).fetchone()
+        finally:
+            conn.close()
+        if row is None:
+            return None
+        item = dict(row)
+        item["meta"] = json.loads(item["meta"])
+        return item
+
+    def get_state(self, key: str) -> str | None:
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT value FROM catalog_state WHERE key = ?", (key,)).fetchone()
+            return row["value"] if row else None
+        finally:
+            conn.close()
+
+    def set_state(self, key: str, value: str) -> None:
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute("INSERT OR REPLACE INTO catalog_state VALUES (?, ?)", (key, value))
+        finally:
+            conn.close()
+
+    def import_folder(self, folder) -> int:
+        """
+        One-time import of assignments saved before the catalog existed.
+        Returns the number of rows added (0 once the folder has been imported).
+        """
+        folder = Path(folder)
+        state_key = f"imported:{folder.resolve()}"
+        conn = self._connect()
+        try:
+            if conn.execute("SELECT 1 FROM catalog_state WHERE key = ?", (state_key,)).fetchone():
+                return 0
+            rows = []
+            for path in folder.glob("assignment_*.txt"):
+                aid = path.name[len("assignment_"):-len(".txt")]
+                meta_path = folder / f"assignment_{aid}.meta.json"
+                try:
+                    meta = json.loads(meta_path.read_text(encoding="utf-8"))
+                except Exception:
+                    meta = {}
+                meta.setdefault("id", aid)
+                rows.append(self._row_values(meta, path.name, path.stat().st_mtime))
+            for path in folder.glob("assignment_*.json"):
+                if path.name.endswith((".meta.json", ".crossword.json")):
+                    continue
+                try:
+                    meta = json.loads(path.read_text(encoding="utf-8")).get("meta") or {}
+                except Exception:
+                    meta = {}
+                meta.setdefault("id", path.name[len("assignment_"):-len(".json")])
+                rows.append(self._row_values(meta, path.name, meta.get("created", path.stat().st_mtime)))
+            for path in folder.glob("assignment_*.crossword.json"):
+                try:
+                    meta = json.loads(path.read_text(encoding="utf-8")).get("meta") or {}
+                except Exception:
+                    meta = {}
+                meta.setdefault("id", path.name[len("assignment_"):-len(".crossword.json")])
+                meta.setdefault("q_type", "Crossword")
+                rows.append(self._row_values(meta, path.name, path.stat().st_mtime))
+            with conn:
+                before = conn.total_changes
+                conn.executemany("INSERT OR IGNORE INTO assignments VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+                added = conn.total_changes - before
+                conn.execute("INSERT INTO catalog_state VALUES (?, ?)", (state_key, str(time.time())))
+            return added
+        finally:
+            conn.close()
+
+def write_json_atomic(path, obj) -> None:
+    """
+    Write obj as JSON to a temp file next to path and rename it into place,
+    so a concurrent reader sees the old file or the new one, never half.
+    """
+    path = Path(path)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=path.name + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(obj, f, indent=2)
+        os.replace(tmp, path)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+
+def convert_legacy_assignment(txt_path) -> Path:
+    """
+    Convert a legacy assignment_<id>.txt (+ .meta.json) into the structured
+    assignment_<id>.json format, once; later calls return the existing file.
+    """
+    txt_path = Path(txt_path)
+    aid = txt_path.name[len("assignment_"):-len(".txt")]
+    out_path = txt_path.with_name(f"assignment_{aid}.json")
+    if out_path.exists():
+        return out_path
+    meta_path = txt_path.with_name(f"assignment_{aid}.meta.json")
+    try:
+        meta = json.loads(meta_path.read_text(encoding="utf-8"))
+    except Exception:
+        meta = {}
+    meta.setdefault("id", aid)
+    questions = parse_questions_fast(txt_path.read_text(encoding="utf-8"))
+    # an answer key saved with the meta wins over what the parser recovers
+    answer_key = meta.pop("answer_key", None) or {}
+    for q in questions:
+        if answer_key.get(q["id"]):
+            q["answer"] = answer_key[q["id"]]
+        q.setdefault("q_type", meta.get("q_type"))
+    # two students may load the same legacy file at once
+    write_json_atomic(out_path, {"meta": meta, "questions": questions})
+    return out_path
+
+def new_assignment_meta(batch: str, q_type: str, num_q: int, difficulty: str, source_file: str | None) -> dict:
+    return {
+        "id": uuid.uuid4().hex,
+        "batch": batch,
+        "q_type": q_type,
+        "num_q": num_q,
+        "difficulty": difficulty,
+        "source_file": source_file,
+        "created": time.time()
+    }
+
+def save_question_assignment(catalog: AssignmentCatalog, folder, meta: dict, questions: list) -> tuple:
+    """
+    Validate and write assignment_<id>.json plus its catalog row, as Save &
+    Assign does. Returns (path, errors, missing answer keys); nothing is
+    written when errors is non-empty.
+    """
+    out_path = Path(folder) / f"assignment_{meta['id']}.json"
+    questions = [dict(q, q_type=q.get("q_type", meta.get("q_type"))) for q in questions]
+    obj = {"meta": meta, "questions": questions}
+    errors = validate_assignment(obj)
+    if errors:
+        return out_path, errors, []
+    catalog.add_assignment(meta, out_path.name,
+                           write=lambda: write_json_atomic(out_path, obj))
+    return out_path, [], missing_answer_keys(questions)
+
+def save_crossword_assignment(catalog: AssignmentCatalog, folder, meta: dict, crossword: dict,
+                              num_variants: int = 1) -> tuple:
+    """
+    Write assignment_<id>.crossword.json (with up to num_variants distinct
+    per-student layouts when more than one) plus its catalog row. Variant 0
+    is the previewed layout; the others place exactly its words.
+    Returns (path, number of layouts stored), which can be fewer than asked.
+    """
+    out_path = Path(folder) / f"assignment_{meta['id']}.crossword.json"
+    cw = dict(crossword)
+    layouts = 1
+    if num_variants > 1:
+        from .crossword import generate_layout_variants
+        words = [p["word"] for p in cw["placed"]]
+        variants = [{"seed": 0, "placed": cw["placed"]}]
+        variants += generate_layout_variants(words, int(num_variants) - 1, size=cw["size"], base_seed=1,
+                                             exclude=[cw["placed"]])
+        cw["variants"] = [dict(v, unused=cw.get("unused", [])) for v in variants]
+        layouts = len(variants)
+    obj = {
+        "meta": meta,
+        "crossword": cw
+    }
+    catalog.add_assignment(meta, out_path.name,
+                           write=lambda: write_json_atomic(out_path, obj))
+    return out_path, layouts
@@ -1,12 +1,26 @@
 # utils/crossword.py
+import os
+import math
 import random
-import json
+import hashlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from collections import defaultdict
 from typing import List, Tuple, Dict
+import numpy as np
 from .gemini_utils import gemini_generate
+from .retrieval import select_context
+from .telemetry import traced
 
-def ask_gemini_for_words_and_clues(extracted_text: str, num_words: int = 10) -> List[Tuple[str, str]]:
+# Characters of source text sent to Gemini when picking crossword words
+CROSSWORD_CONTEXT_CHARS = 4500
+# Seeds tried per requested layout variant before settling for fewer variants
+VARIANT_SEED_TRIES = 8
+
+def ask_gemini_for_words_and_clues(extracted_text: str, num_words: int = 10, topic: str | None = None) -> List[Tuple[str, str]]:
     """
     Ask Gemini to extract important words and short clues from the extracted_text.
+    The prompt context is the most informative (or topic-matching) passages.
     Returns a list of (word, clue) pairs. Words are uppercase and contain only A-Z.
     """
     prompt = f"""
@@ -15,7 +29,7 @@ useful for a classroom crossword. For each word return a short clue (one sentenc
 Return output as lines in the format: WORD|Clue
 
 Text:
-{extracted_text[:4500]}
+{select_context(extracted_text, CROSSWORD_CONTEXT_CHARS, topic)}
 """
     out = gemini_generate(prompt)
     pairs = []
@@ -70,109 +84,282 @@ def place_word(grid, word, row, col, direction):
             grid[row+i][col] = ch
         return True
 
-def try_place_words(words: List[str], size=15, shuffle=True) -> Dict:
+ACROSS, DOWN = 1, 2
+FILLER_LETTERS = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+
+def auto_grid_size(words: List[str]) -> int:
+    """
+    Grid side that comfortably fits words: at least the longest word, and
+    roughly twice the square root of the total letter count.
+    """
+    if not words:
+        return 5
+    return max(max(len(w) for w in words), math.ceil(2 * math.sqrt(sum(len(w) for w in words))))
+
+class _PlacementGrid:
+    """
+    Grid state for the placement search: letters, which directions cover each
+    cell, a letter -> cells index of placed letters and the bounding box.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self.cells = create_empty_grid(size)
+        self.dirs = [[0] * size for _ in range(size)]
+        self.letter_index = defaultdict(set)
+
+    def _cell_dir(self, direction: str) -> int:
+        return ACROSS if direction == "across" else DOWN
+
+    def _coords(self, word: str, row: int, col: int, direction: str):
+        dr, dc = (0, 1) if direction == "across" else (1, 0)
+        return [(row + dr * k, col + dc * k) for k in range(len(word))], dr, dc
+
+    def _empty(self, r: int, c: int) -> bool:
+        return not (0 <= r < self.size and 0 <= c < self.size) or self.cells[r][c] == ""
+
+    def crossings(self, word: str, row: int, col: int, direction: str) -> int:
+        """
+        Number of crossings if word can legally go at (row, col), else -1.
+        Legal means: in bounds, matching letters where it crosses, empty cells
+        just before and after it, and no new letter touching a parallel word.
+        """
+        size = self.size
+        coords, dr, dc = self._coords(word, row, col, direction)
+        r_end, c_end = coords[-1]
+        if row < 0 or col < 0 or r_end >= size or c_end >= size:
+            return -1
+        if not self._empty(row - dr, col - dc) or not self._empty(r_end + dr, c_end + dc):
+            return -1
+        bit = self._cell_dir(direction)
+        crossings = 0
+        for (r, c), ch in zip(coords, word):
+            cur = self.cells[r][c]
+            if cur:
+                if cur != ch or self.dirs[r][c] & bit:
+                    return -1
+                crossings += 1
+            elif not self._empty(r + dc, c + dr) or not self._empty(r - dc, c - dr):
+                return -1
+        return crossings
+
+    def place(self, word: str, row: int, col: int, direction: str) -> list:
+        """
+        Write word into the grid and return the newly filled cells (for undo).
+        """
+        coords, _, _ = self._coords(word, row, col, direction)
+        bit = self._cell_dir(direction)
+        new_cells = []
+        for (r, c), ch in zip(coords, word):
+            if not self.cells[r][c]:
+                self.cells[r][c] = ch
+                self.letter_index[ch].add((r, c))
+                new_cells.append((r, c))
+            self.dirs[r][c] |= bit
+        return new_cells
+
+    def remove(self, word: str, row: int, col: int, direction: str, new_cells: list) -> None:
+        coords, _, _ = self._coords(word, row, col, direction)
+        bit = self._cell_dir(direction)
+        for r, c in coords:
+            self.dirs[r][c] &= ~bit
+        for r, c in new_cells:
+            self.letter_index[self.cells[r][c]].discard((r, c))
+            self.cells[r][c] = ""
+
+    def candidates(self, word: str, rng: random.Random) -> list:
+        """
+        Legal positions crossing already placed letters, best first:
+        most crossings, then closest to the grid centre (keeps the layout compact).
+        """
+        seen = set()
+        scored = []
+        centre = (self.size - 1) / 2
+        for i, ch in enumerate(word):
+            for r, c in self.letter_index.get(ch, ()):
+                # cross the existing word perpendicular to it
+                direction = "down" if self.dirs[r][c] == ACROSS else "across" if self.dirs[r][c] == DOWN else None
+                if direction is None:
+                    continue
+                row, col = (r - i, c) if direction == "down" else (r, c - i)
+                if (row, col, direction) in seen:
+                    continue
+                seen.add((row, col, direction))
+                n = self.crossings(word, row, col, direction)
+                if n <= 0:
+                    continue
+                mid_r = row + (len(word) - 1) / 2 * (direction == "down")
+                mid_c = col + (len(word) - 1) / 2 * (direction == "across")
+                spread = abs(mid_r - centre) + abs(mid_c - centre)
+                scored.append((-n, spread, rng.random(), row, col, direction))
+        scored.sort()
+        return [(row, col, direction, -neg) for neg, _, _, row, col, direction in scored]
+
+@traced("crossword.place")
+def try_place_words(words: List[str], size=15, shuffle=True, seed=None, branch: int = 3,
+                    max_nodes: int = 2000) -> Dict:
+    """
+    Lay words out as a connected crossword.
+    Words go longest first; each later word may only cross letters already in
+    the grid (found through a letter -> cell index), and placements are ranked
+    by number of crossings. A bounded backtracking search (at most branch
+    candidates per word, max_nodes search steps) keeps the layout that places
+    the most words, then has the most crossings; it stops at the first layout
+    that places every word. Words that cannot cross
+    anything are returned in "unused" rather than dropped at random.
+    size=None sizes the grid from the words. seed makes the layout (and the
+    filler letters) reproducible.
+    Returns {"grid": [row strings], "placed": [{word, row, col, dir}], "unused": [...], "size": n}.
+    """
+    rng = random.Random(seed)
+    words = [w for w in words if w]
     if shuffle:
         words = sorted(words, key=lambda w: -len(w))
-    grid = create_empty_grid(size)
+    if size is None:
+        size = auto_grid_size(words)
+    grid = _PlacementGrid(size)
+    fits = [w for w in words if len(w) <= size]
+    too_long = [w for w in words if len(w) > size]
+
+    best = {"placed": [], "crossings": -1}
     placed = []
-    unused = []
-
-    if words:
-        first = words[0]
-        r = size // 2
-        c = max(0, (size - len(first)) // 2)
-        if place_word(grid, first, r, c, "across"):
-            placed.append({"word": first, "row": r, "col": c, "dir": "across"})
+    nodes = 0
+
+    def search(k: int, crossings: int) -> None:
+        nonlocal nodes
+        nodes += 1
+        # stop once every word is placed, or if this branch can't beat the best layout
+        if len(best["placed"]) == len(fits) or len(placed) + (len(fits) - k) < len(best["placed"]):
+            return
+        if k == len(fits):
+            if (len(placed), crossings) > (len(best["placed"]), best["crossings"]):
+                best["placed"] = list(placed)
+                best["crossings"] = crossings
+            return
+        word = fits[k]
+        if not placed:
+            options = [(size // 2, max(0, (size - len(word)) // 2), "across", 0)]
         else:
-            ok = False
-            for _ in range(200):
-                rr = random.randrange(size)
-                cc = random.randrange(size)
-                if place_word(grid, first, rr, cc, random.choice(["across","down"])):
-                    placed.append({"word": first, "row": rr, "col": cc, "dir": "across"})
-                    ok = True
-                    break
-            if not ok:
-                unused.append(first)
-
-    for w in words[1:]:
-        placed_flag = False
-        for attempt in range(200):
-            if not placed:
+            options = grid.candidates(word, rng)[:branch]
+        for i, (row, col, direction, n) in enumerate(options):
+            # once the budget is spent, finish greedily with the best candidate
+            if i > 0 and nodes >= max_nodes:
                 break
-            pw = random.choice(placed)
-            base_word = pw["word"]
-            possible_matches = []
-            for i,ch1 in enumerate(base_word):
-                for j,ch2 in enumerate(w):
-                    if ch1 == ch2:
-                        possible_matches.append((i,j))
-            if not possible_matches:
-                row = random.randrange(size)
-                col = random.randrange(size)
-                dirc = random.choice(["across","down"])
-                if place_word(grid,w,row,col,dirc):
-                    placed.append({"word": w, "row": row, "col": col, "dir": dirc})
-                    placed_flag = True
-                    break
-                continue
-            i,j = random.choice(possible_matches)
-            base_row = pw["row"]
-            base_col = pw["col"]
-            if pw["dir"] == "across":
-                target_row = base_row - j
-                target_col = base_col + i
-                if 0 <= target_row and target_row + len(w) <= size and 0 <= target_col < size:
-                    ok = True
-                    for k,ch in enumerate(w):
-                        cur = grid[target_row + k][target_col]
-                        if cur not in ("", ch):
-                            ok = False
-                            break
-                    if ok:
-                        for k,ch in enumerate(w):
-                            grid[target_row + k][target_col] = ch
-                        placed.append({"word": w, "row": target_row, "col": target_col, "dir": "down"})
-                        placed_flag = True
-                        break
-            else:
-                target_row = base_row + i
-                target_col = base_col - j
-                if 0 <= target_col and target_col + len(w) <= size and 0 <= target_row < size:
-                    ok = True
-                    for k,ch in enumerate(w):
-                        cur = grid[target_row][target_col + k]
-                        if cur not in ("", ch):
-                            ok = False
-                            break
-                    if ok:
-                        for k,ch in enumerate(w):
-                            grid[target_row][target_col + k] = ch
-                        placed.append({"word": w, "row": target_row, "col": target_col, "dir": "across"})
-                        placed_flag = True
-                        break
-        if not placed_flag:
-            for _ in range(200):
-                rr = random.randrange(size)
-                cc = random.randrange(size)
-                dirc = random.choice(["across","down"])
-                if place_word(grid,w,rr,cc,dirc):
-                    placed.append({"word": w, "row": rr, "col": cc, "dir": dirc})
-                    placed_flag = True
-                    break
-        if not placed_flag:
-            unused.append(w)
+            new_cells = grid.place(word, row, col, direction)
+            placed.append({"word": word, "row": row, "col": col, "dir": direction})
+            search(k + 1, crossings + n)
+            placed.pop()
+            grid.remove(word, row, col, direction, new_cells)
+        if not options or nodes < max_nodes:
+            # leave this word out
+            search(k + 1, crossings)
+
+    search(0, 0)
 
+    placed_words = {p["word"] for p in best["placed"]}
+    unused = [w for w in fits if w not in placed_words] + too_long
+    grid_lines = grid_from_placement(best["placed"], size, rng)
+    return {"grid": grid_lines, "placed": best["placed"], "unused": unused, "size": size}
+
+def grid_from_placement(placed: List[Dict], size: int, rng=None) -> List[str]:
+    """
+    Render a placement list into grid row strings, filling empty cells with
+    random letters (pass a seed or random.Random for a reproducible grid).
+    """
+    if not isinstance(rng, random.Random):
+        rng = random.Random(rng)
+    cells = create_empty_grid(size)
+    for p in placed:
+        place_word(cells, p["word"], p["row"], p["col"], p["dir"])
     for r in range(size):
         for c in range(size):
-            if grid[r][c] == "":
-                grid[r][c] = random.choice("ABCDEFGHIJKLMNOPQRSTUVWXYZ")
+            if cells[r][c] == "":
+                cells[r][c] = rng.choice(FILLER_LETTERS)
+    return ["".join(row) for row in cells]
+
+def _layout_variant(args) -> Dict:
+    words, size, seed = args
+    rng = random.Random(seed)
+    # jitter the longest-first order so each seed starts from a different layout
+    order = sorted(words, key=lambda w: -len(w) + rng.random() * 3)
+    res = try_place_words(order, size=size, shuffle=False, seed=seed)
+    return {"seed": seed, "placed": res["placed"], "unused": res["unused"]}
 
-    grid_lines = ["".join(row) for row in grid]
-    return {"grid": grid_lines, "placed": placed, "unused": unused}
+@traced("crossword.variants")
+def layout_key(placed: List[Dict]) -> tuple:
+    """
+    Hashable identity of a layout: two variants with equal keys are the same puzzle.
+    """
+    return tuple(sorted((p["word"], p["row"], p["col"], p["dir"]) for p in placed))
+
+def generate_layout_variants(words: List[str], num_variants: int, size: int = 15, base_seed: int = 0,
+                             max_workers: int | None = None, exclude: List[List[Dict]] = ()) -> List[Dict]:
+    """
+    Build up to num_variants seeded layouts of the same words in a process
+    pool. Only layouts that place every word are kept (so each student gets
+    the same puzzle), trying up to VARIANT_SEED_TRIES seeds per variant; fewer
+    are returned if the words rarely all fit. Layouts identical to an earlier
+    one, or to one of the exclude placements, are skipped. Each variant is stored compactly
+    as {seed, placed, unused}; the grid is rebuilt with
+    grid_from_placement(placed, size, seed).
+    """
+    words = list(words)
+    variants = []
+    seen = {layout_key(placed) for placed in exclude}
+    seed, last_seed = base_seed, base_seed + num_variants * VARIANT_SEED_TRIES
+    pool = None
+    try:
+        while len(variants) < num_variants and seed < last_seed:
+            # a little over what's missing, since some seeds won't fit every word
+            batch = [(words, size, s) for s in range(seed, min(last_seed, seed + 2 * (num_variants - len(variants))))]
+            seed += len(batch)
+            if len(batch) == 1 and pool is None:
+                results = [_layout_variant(batch[0])]
+            else:
+                if pool is None:
+                    # spawn, not fork: the app process has threads (and gRPC) running
+                    pool = ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"))
+                results = pool.map(_layout_variant, batch,
+                                   chunksize=max(1, len(batch) // (4 * (os.cpu_count() or 1))))
+            for v in results:
+                key = layout_key(v["placed"])
+                if not v["unused"] and key not in seen:
+                    seen.add(key)
+                    variants.append(v)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return variants[:num_variants]
+
+def variant_for_student(student_id: str, num_variants: int) -> int:
+    """
+    Deterministic variant index for a student (same ID, same layout).
+    """
+    digest = hashlib.sha256((student_id or "").strip().lower().encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") % max(1, num_variants)
 
-def build_crossword_from_text(extracted_text: str, num_words:int = 10, grid_size:int=15):
-    pairs = ask_gemini_for_words_and_clues(extracted_text, num_words=num_words)
+def crossword_for_student(crossword: Dict, student_id: str) -> Dict:
+    """
+    The crossword as a given student should see it: their variant's layout
+    and grid when the assignment has variants, else the shared one.
+    """
+    variants = crossword.get("variants")
+    if not variants:
+        return crossword
+    variant = variants[variant_for_student(student_id, len(variants))]
+    size = crossword["size"]
+    return dict(crossword, placed=variant["placed"], unused=variant["unused"],
+                grid=grid_from_placement(variant["placed"], size, variant["seed"]))
+
+@traced("crossword.build")
+def build_crossword_from_text(extracted_text: str, num_words:int = 10, grid_size: int | None = None,
+                              topic: str | None = None):
+    """
+    Pick words and clues from the text (Gemini, falling back to frequent
+    words) and lay them out; grid_size None sizes the grid to the words.
+    Words that could not be placed are listed under "unused".
+    """
+    pairs = ask_gemini_for_words_and_clues(extracted_text, num_words=num_words, topic=topic)
     if not pairs or len(pairs) < min(3, num_words):
         words = []
         import re
@@ -196,22 +383,152 @@ def build_crossword_from_text(extracted_text: str, num_words:int = 10, grid_size
         "grid": placement["grid"],
         "placed": placement["placed"],
         "unused": placement["unused"],
-        "size": grid_size
+        "size": placement["size"]
     }
     return result
 
-def grade_crossword_submission(solution_grid_lines: List[str], student_grid_lines: List[str]) -> Dict:
-    rows = len(solution_grid_lines)
-    cols = len(solution_grid_lines[0]) if rows>0 else 0
-    total = rows * cols
-    correct = 0
-    for r in range(rows):
-        sol_row = solution_grid_lines[r]
-        stu_row = student_grid_lines[r] if r < len(student_grid_lines) else ""
-        for c in range(cols):
-            sol_ch = sol_row[c] if c < len(sol_row) else ""
-            stu_ch = stu_row[c] if c < len(stu_row) else ""
-            if sol_ch.upper() == (stu_ch or "").upper():
-                correct += 1
-    score = correct / total if total>0 else 0.0
-    return {"total_cells": total, "correct_cells": correct, "score_fraction": score}
+def clue_numbers(placed: List[Dict]) -> List[int]:
+    """
+    Conventional clue numbers for placed words: start cells numbered in
+    reading order, words sharing a start cell sharing the number.
+    """
+    starts = sorted({(p["row"], p["col"]) for p in placed})
+    number = {cell: i for i, cell in enumerate(starts, start=1)}
+    return [number[(p["row"], p["col"])] for p in placed]
+
+def _entry_letters(answer: str, length: int) -> str:
+    return "".join(ch for ch in (answer or "").upper() if not ch.isspace())[:length]
+
+def word_cells(p: Dict) -> list:
+    """
+    (row, col) of each letter of a placed word, in order.
+    """
+    n = len(p["word"])
+    if p["dir"] == "across":
+        return [(p["row"], p["col"] + k) for k in range(n)]
+    return [(p["row"] + k, p["col"]) for k in range(n)]
+
+def answers_to_grid(placed: List[Dict], answers: List[str], size: int) -> List[str]:
+    """
+    Write per-word answers (aligned with placed) into grid row strings; cells
+    outside the words, and letters not entered, are blanks. Where two answers
+    cross and disagree the cell shows "?" (see crossing_conflicts).
+    """
+    cells = [[" "] * size for _ in range(size)]
+    for p, answer in zip(placed, answers):
+        for (r, c), ch in zip(word_cells(p), _entry_letters(answer, len(p["word"]))):
+            cells[r][c] = ch if cells[r][c] in (" ", ch) else "?"
+    return ["".join(row) for row in cells]
+
+def crossing_conflicts(placed: List[Dict], answers: List[str]) -> List[Tuple[int, int]]:
+    """
+    Cells where two entered answers put different letters.
+    """
+    seen, conflicts = {}, set()
+    for p, answer in zip(placed, answers):
+        for cell, ch in zip(word_cells(p), _entry_letters(answer, len(p["word"]))):
+            if seen.setdefault(cell, ch) != ch:
+                conflicts.add(cell)
+    return sorted(conflicts)
+
+def grade_crossword_entries(placed: List[Dict], answers: List[str]) -> Dict:
+    """
+    Grade per-word entries (aligned with placed), each word against its own
+    input, so a wrong crossing word can't overwrite a right one. A cell counts
+    as correct when every entry covering it has the right letter there.
+    Returns total_cells, correct_cells, score_fraction, words ({word: bool})
+    and conflicts (cells where entries disagree).
+    """
+    cell_ok = {}
+    words = {}
+    for p, answer in zip(placed, answers):
+        letters = _entry_letters(answer, len(p["word"]))
+        words[p["word"]] = letters == p["word"].upper()
+        for k, cell in enumerate(word_cells(p)):
+            ok = k < len(letters) and letters[k] == p["word"][k].upper()
+            cell_ok[cell] = cell_ok.get(cell, True) and ok
+    for p in placed[len(answers):]:
+        words[p["word"]] = False
+        for cell in word_cells(p):
+            cell_ok[cell] = False
+    total = len(cell_ok)
+    correct = sum(cell_ok.values())
+    return {"total_cells": total, "correct_cells": correct,
+            "score_fraction": correct / total if total else 0.0,
+            "words": words, "conflicts": crossing_conflicts(placed, answers)}
+
+def _grid_codes(lines: List[str], size: int) -> np.ndarray:
+    # one uppercase ASCII byte per cell; short/missing rows are padded with blanks
+    rows = [(lines[r] if r < len(lines) else "")[:size].ljust(size) for r in range(size)]
+    return np.frombuffer("".join(rows).upper().encode("ascii", "replace"), dtype=np.uint8).reshape(size, size)
+
+def answer_cell_mask(placed: List[Dict], size: int) -> np.ndarray:
+    """
+    Boolean size x size mask of the cells covered by placed words.
+    """
+    mask = np.zeros((size, size), dtype=bool)
+    for p in placed:
+        n = len(p["word"])
+        if p["dir"] == "across":
+            mask[p["row"], p["col"]:p["col"] + n] = True
+        else:
+            mask[p["row"]:p["row"] + n, p["col"]] = True
+    return mask
+
+@traced("crossword.grade_batch")
+def grade_crossword_batch(solution_grid_lines: List[str], placed: List[Dict], submissions: List[List[str]]) -> Dict:
+    """
+    Grade many filled-in crossword grids at once, counting only the cells
+    that belong to placed words (filler letters are ignored). For offline
+    use (regrading exported or scanned grids); the app stores per-word
+    entries and grades them with grade_crossword_entries.
+    Returns NumPy arrays over the n submissions:
+    cell_correct (n, size, size; False outside answer cells), correct_cells (n,),
+    word_correct (n, len(placed)), score_fraction (n,), plus total_cells and words.
+    """
+    size = len(solution_grid_lines)
+    mask = answer_cell_mask(placed, size)
+    solution = _grid_codes(solution_grid_lines, size)
+    if submissions:
+        answers = np.stack([_grid_codes(lines, size) for lines in submissions])
+    else:
+        answers = np.zeros((0, size, size), dtype=np.uint8)
+    cell_correct = (answers == solution) & mask
+    correct_cells = cell_correct.sum(axis=(1, 2))
+    total = int(mask.sum())
+
+    # word correctness: gather each word's cells through a padded index matrix,
+    # padding with an extra always-correct column
+    n = len(submissions)
+    flat = np.concatenate([cell_correct.reshape(n, -1), np.ones((n, 1), dtype=bool)], axis=1)
+    max_len = max((len(p["word"]) for p in placed), default=0)
+    index = np.full((len(placed), max_len), size * size, dtype=np.intp)
+    for w, p in enumerate(placed):
+        k = np.arange(len(p["word"]))
+        if p["dir"] == "across":
+            index[w, :len(k)] = p["row"] * size + p["col"] + k
+        else:
+            index[w, :len(k)] = (p["row"] + k) * size + p["col"]
+    word_correct = flat[:, index].all(axis=2) if placed else np.zeros((n, 0), dtype=bool)
+
+    return {
+        "total_cells": total,
+        "words": [p["word"] for p in placed],
+        "cell_correct": cell_correct,
+        "correct_cells": correct_cells,
+        "word_correct": word_correct,
+        "score_fraction": correct_cells / total if total else np.zeros(n),
+    }
+
+@traced("crossword.grade")
+def grade_crossword_submission(solution_grid_lines: List[str], student_grid_lines: List[str],
+                               placed: List[Dict]) -> Dict:
+    """
+    Grade one filled-in grid: only answer cells count (filler letters are
+    ignored), with per-word correctness. Grids entered word by word are
+    graded with grade_crossword_entries instead.
+    """
+    res = grade_crossword_batch(solution_grid_lines, placed, [student_grid_lines])
+    return {"total_cells": res["total_cells"], "correct_cells": int(res["correct_cells"][0]),
+            "score_fraction": float(res["score_fraction"][0]),
+            "words": {w: bool(ok) for w, ok in zip(res["words"], res["word_correct"][0])}}
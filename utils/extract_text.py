@@ -1,36 +1,171 @@
-from PyPDF2 import PdfReader
-import docx
-from pptx import Presentation
+import io
+import os
+import hashlib
+import zipfile
+from .cache import CACHE_DIR, DiskCache
+from .telemetry import annotate, span
 
-def extract_text_from_path(path: str) -> str:
+# Extracted text keyed by SHA-256 of the document bytes, so regenerating from the
+# same upload skips parsing. Bounded by total size; least recently used go first.
+_text_cache = DiskCache(
+    CACHE_DIR / "extract",
+    max_entries=int(os.environ.get("EXTRACT_CACHE_MAX_ENTRIES", "500")),
+    max_bytes=int(os.environ.get("EXTRACT_CACHE_MAX_BYTES", str(200 * 1024 * 1024))),
+)
+
+SUPPORTED_TYPES = ("pdf", "docx", "pptx")
+MIME_TYPES = {
+    "application/pdf": "pdf",
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document": "docx",
+    "application/vnd.openxmlformats-officedocument.presentationml.presentation": "pptx",
+}
+
+def file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def file_type_from_path(path: str) -> str:
     """
-    Extracts and returns plain text from .pdf, .docx, or .pptx files.
+    Return "pdf", "docx" or "pptx" from the path suffix.
     Raises ValueError for unsupported extensions.
     """
-    path_lower = path.lower()
-    text_chunks = []
+    ext = os.path.splitext(path)[1].lower().lstrip(".")
+    if ext not in SUPPORTED_TYPES:
+        raise ValueError("Unsupported file type. Use .pdf, .docx or .pptx")
+    return ext
+
+def detect_file_type(data: bytes, mime: str | None = None) -> str:
+    """
+    Return "pdf", "docx" or "pptx" for an in-memory document, trusting a known
+    MIME type first and otherwise sniffing magic bytes / the OOXML zip layout.
+    Raises ValueError for anything else.
+    """
+    if mime in MIME_TYPES:
+        return MIME_TYPES[mime]
+    head = bytes(data[:8])
+    if head.startswith(b"%PDF"):
+        return "pdf"
+    if head.startswith(b"PK\x03\x04"):
+        try:
+            with zipfile.ZipFile(io.BytesIO(data)) as zf:
+                names = set(zf.namelist())
+        except zipfile.BadZipFile:
+            names = set()
+        if "word/document.xml" in names:
+            return "docx"
+        if "ppt/presentation.xml" in names:
+            return "pptx"
+    raise ValueError("Unsupported file type. Use .pdf, .docx or .pptx")
 
-    if path_lower.endswith(".pdf"):
-        with open(path, "rb") as f:
-            reader = PdfReader(f)
-            for page in reader.pages:
-                t = page.extract_text()
-                if t:
-                    text_chunks.append(t)
+def iter_text_chunks(source, file_type: str | None = None):
+    """
+    Lazily yield non-empty text chunks (one per PDF page, DOCX paragraph or
+    PPTX shape) so callers can stop reading once they have enough context.
+    source is a path or a binary file-like object; file_type is required for
+    file-like sources and inferred from the suffix for paths.
+    Raises ValueError for unsupported types.
+    """
+    if file_type is None:
+        file_type = file_type_from_path(source)
 
-    elif path_lower.endswith(".docx"):
-        doc = docx.Document(path)
+    if file_type == "pdf":
+        if isinstance(source, (str, os.PathLike)):
+            with open(source, "rb") as f:
+                yield from iter_text_chunks(f, "pdf")
+            return
+        # parser libraries are imported on first use of their file type
+        from PyPDF2 import PdfReader
+        reader = PdfReader(source)
+        for page in reader.pages:
+            t = page.extract_text()
+            if t:
+                yield t
+
+    elif file_type == "docx":
+        import docx
+        doc = docx.Document(source)
         for para in doc.paragraphs:
             if para.text:
-                text_chunks.append(para.text)
+                yield para.text
 
-    elif path_lower.endswith(".pptx"):
-        prs = Presentation(path)
+    elif file_type == "pptx":
+        from pptx import Presentation
+        prs = Presentation(source)
         for slide in prs.slides:
             for shape in slide.shapes:
                 if hasattr(shape, "text") and shape.text:
-                    text_chunks.append(shape.text)
+                    yield shape.text
     else:
         raise ValueError("Unsupported file type. Use .pdf, .docx or .pptx")
 
-    return "\n\n".join(text_chunks).strip()
+def join_chunks(chunks, max_chars: int | None = None) -> str:
+    """
+    Join text chunks with blank lines, consuming only as many chunks as are
+    needed to fill max_chars (all of them when max_chars is None).
+    """
+    text_chunks = []
+    size = 0
+    for chunk in chunks:
+        text_chunks.append(chunk)
+        size += len(chunk) + 2
+        if max_chars is not None and size > max_chars:
+            break
+    text = "\n\n".join(text_chunks).strip()
+    return text if max_chars is None else text[:max_chars]
+
+def _cached_extract(digest: str | None, open_chunks, max_chars: int | None) -> str:
+    key = None
+    if digest is not None:
+        # a cached full text also serves any budgeted request
+        cached = _text_cache.get(DiskCache.make_key("text", digest, None))
+        if cached is not None:
+            annotate(cache_hit=True, chars=len(cached))
+            return cached if max_chars is None else cached[:max_chars]
+        key = DiskCache.make_key("text", digest, max_chars)
+        if max_chars is not None:
+            cached = _text_cache.get(key)
+            if cached is not None:
+                annotate(cache_hit=True, chars=len(cached))
+                return cached
+
+    text = join_chunks(open_chunks(), max_chars=max_chars)
+    annotate(chars=len(text))
+    if key is not None:
+        _text_cache.set(key, text)
+    return text
+
+def extract_text_from_path(path: str, use_cache: bool = True, max_chars: int | None = None) -> str:
+    """
+    Extracts and returns plain text from .pdf, .docx, or .pptx files.
+    Raises ValueError for unsupported extensions.
+    With max_chars set, parsing stops as soon as that many characters are read.
+    Results are cached by file content hash unless use_cache is False.
+    """
+    file_type = file_type_from_path(path)
+    with span("extract", file_type=file_type, bytes=os.path.getsize(path)):
+        digest = file_sha256(path) if use_cache else None
+        return _cached_extract(digest, lambda: iter_text_chunks(path, file_type), max_chars)
+
+def extract_text_from_bytes(data, mime: str | None = None, use_cache: bool = True,
+                            max_chars: int | None = None) -> str:
+    """
+    Same as extract_text_from_path for an in-memory document (bytes, memoryview
+    or a binary file-like object such as a Streamlit upload), without touching
+    disk. The type comes from mime when known, otherwise from the content.
+    """
+    if hasattr(data, "read"):
+        data = data.getvalue() if hasattr(data, "getvalue") else data.read()
+    view = memoryview(data)
+    file_type = detect_file_type(view, mime=mime)
+    with span("extract", file_type=file_type, bytes=view.nbytes):
+        digest = hashlib.sha256(view).hexdigest() if use_cache else None
+        return _cached_extract(digest, lambda: iter_text_chunks(io.BytesIO(view), file_type), max_chars)
+
+def extraction_cache_stats() -> dict:
+    """
+    Hit/miss counters and size of the extracted-text cache.
+    """
+    return _text_cache.stats()
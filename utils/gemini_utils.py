@@ -1,30 +1,387 @@
 # utils/gemini_utils.py
 import os
+import re
+import json
+import time
+import random
+import threading
+from functools import lru_cache
 from dotenv import load_dotenv
-import google.generativeai as genai
+from .cache import CACHE_DIR, DiskCache
+from .telemetry import annotate, estimate_tokens, span
 
 # load .env if present
 load_dotenv()
 
 # Model to use
-GEMINI_MODEL = "gemini-2.5-flash"
+GEMINI_MODEL = os.environ.get("GEMINI_MODEL", "gemini-2.5-flash")
+# "gemini" (default) or "fake" for the offline backend used in tests and load runs
+GEMINI_BACKEND = os.environ.get("GEMINI_BACKEND", "gemini")
+
+# Client limits: requests per minute (token bucket), calls in flight, seconds per call
+GEMINI_RPM = float(os.environ.get("GEMINI_RPM", "60"))
+GEMINI_BURST = int(os.environ.get("GEMINI_BURST", "10"))
+GEMINI_MAX_CONCURRENCY = int(os.environ.get("GEMINI_MAX_CONCURRENCY", "8"))
+GEMINI_TIMEOUT = float(os.environ.get("GEMINI_TIMEOUT", "60"))
+GEMINI_MAX_RETRIES = int(os.environ.get("GEMINI_MAX_RETRIES", "4"))
+
+@lru_cache(maxsize=1)
+def transient_errors() -> tuple:
+    """
+    Errors worth retrying: quota, overload, timeouts, dropped connections.
+    Only evaluated once a call has failed, so the SDK isn't imported for it.
+    """
+    try:
+        from google.api_core import exceptions as api_exceptions
+    except ImportError:
+        return (TimeoutError, ConnectionError)
+    return (
+        api_exceptions.ResourceExhausted,
+        api_exceptions.TooManyRequests,
+        api_exceptions.ServiceUnavailable,
+        api_exceptions.InternalServerError,
+        api_exceptions.DeadlineExceeded,
+        TimeoutError,
+        ConnectionError,
+    )
+
+# Response cache: identical (model, prompt, generation params) reuse the stored reply.
+# Set GEMINI_CACHE=0 to disable it globally.
+GEMINI_CACHE_ENABLED = os.environ.get("GEMINI_CACHE", "1") != "0"
+_response_cache = DiskCache(
+    CACHE_DIR / "gemini",
+    max_entries=int(os.environ.get("GEMINI_CACHE_MAX_ENTRIES", "5000")),
+    ttl_seconds=float(os.environ.get("GEMINI_CACHE_TTL", str(7 * 24 * 3600))),
+)
+
+# google.generativeai takes most of a second to import, so it is loaded on the
+# first real call (or by prewarm_sdk in the background), not at import time
+_api_key = None
+_genai = None
+_sdk_lock = threading.Lock()
 
 def configure_gemini(api_key: str | None = None):
     """
     Configure google.generativeai with an API key.
     Reads GEMINI_API_KEY from environment if api_key not provided.
+    The offline fake backend needs no key.
     """
+    global _api_key
+    if GEMINI_BACKEND == "fake":
+        return
     key = api_key or os.environ.get("GEMINI_API_KEY")
     if not key:
         raise RuntimeError("GEMINI_API_KEY not set. Set environment variable or pass it to configure_gemini().")
-    genai.configure(api_key=key)
+    with _sdk_lock:
+        _api_key = key
+        if _genai is not None:
+            _genai.configure(api_key=key)
+
+def load_sdk():
+    """
+    Import (once) and return the configured google.generativeai module.
+    """
+    global _genai
+    with _sdk_lock:
+        if _genai is None:
+            import google.generativeai as genai
+            if _api_key:
+                genai.configure(api_key=_api_key)
+            _genai = genai
+        return _genai
+
+def prewarm_sdk() -> None:
+    """
+    Start importing the SDK on a daemon thread so the first Generate click
+    doesn't pay for it. No-op for the fake backend.
+    """
+    if GEMINI_BACKEND != "fake" and _genai is None:
+        threading.Thread(target=load_sdk, name="gemini-sdk-import", daemon=True).start()
+
+class LLMBackend:
+    """
+    Interface for text generation backends used by LLMClient.
+    """
+
+    def generate(self, prompt: str, generation_config: dict | None = None, timeout: float | None = None) -> str:
+        raise NotImplementedError
+
+    def generate_stream(self, prompt: str, generation_config: dict | None = None, timeout: float | None = None):
+        yield self.generate(prompt, generation_config, timeout)
+
+class GeminiBackend(LLMBackend):
+    """
+    google.generativeai backend. GenerativeModel instances are created once
+    per (model, generation_config) and reused across calls and threads.
+    """
+
+    def __init__(self, model_name: str = GEMINI_MODEL):
+        self.model_name = model_name
+        self._models = {}
+        self._lock = threading.Lock()
+
+    def _model(self, generation_config: dict | None):
+        key = json.dumps(generation_config or {}, sort_keys=True)
+        with self._lock:
+            model = self._models.get(key)
+            if model is None:
+                model = load_sdk().GenerativeModel(self.model_name, generation_config=generation_config)
+                self._models[key] = model
+            return model
+
+    def generate(self, prompt, generation_config=None, timeout=None) -> str:
+        options = {"timeout": timeout} if timeout else None
+        response = self._model(generation_config).generate_content(prompt, request_options=options)
+        _annotate_usage(response)
+        # response.text should contain the reply for this SDK version
+        return getattr(response, "text", "") or ""
+
+    def generate_stream(self, prompt, generation_config=None, timeout=None):
+        options = {"timeout": timeout} if timeout else None
+        last = None
+        for chunk in self._model(generation_config).generate_content(prompt, stream=True, request_options=options):
+            last = chunk
+            text = getattr(chunk, "text", "") or ""
+            if text:
+                yield text
+        # the last chunk carries the usage totals for the whole reply
+        _annotate_usage(last)
+
+def _annotate_usage(response) -> None:
+    """
+    Record the token counts Gemini reports on the current telemetry span.
+    """
+    usage = getattr(response, "usage_metadata", None)
+    if not usage or not getattr(usage, "prompt_token_count", 0):
+        return
+    annotate(prompt_tokens=usage.prompt_token_count, output_tokens=usage.candidates_token_count)
+
+class FakeBackend(LLMBackend):
+    """
+    Offline backend for tests and load runs. Replies come from responder(prompt)
+    when given, otherwise from canned answers shaped like the app's prompts
+    (quiz questions, crossword word lists, grading verdicts). latency adds a
+    fixed delay per call.
+    """
+
+    def __init__(self, responder=None, latency: float = 0.0):
+        self.responder = responder
+        self.latency = latency
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def generate(self, prompt, generation_config=None, timeout=None) -> str:
+        with self._lock:
+            self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if self.responder is not None:
+            return self.responder(prompt)
+        return self.canned_reply(prompt)
+
+    def generate_stream(self, prompt, generation_config=None, timeout=None):
+        text = self.generate(prompt, generation_config, timeout)
+        for i in range(0, len(text), 64):
+            yield text[i:i + 64]
+
+    @staticmethod
+    def canned_reply(prompt: str) -> str:
+        m = re.search(r"Generate exactly (\d+) (.+?) questions", prompt)
+        if m:
+            # distinct questions built from the context's words, so the question
+            # bank's near-duplicate check behaves as it would with real replies
+            n = int(m.group(1))
+            words = list(dict.fromkeys(w.lower() for w in re.findall(r"\b[A-Za-z]{5,14}\b", prompt.split("Context:", 1)[-1])))
+            words += [f"term{k}" for k in range(5 * n - len(words))]
+            rng = random.Random(prompt)
+            blocks = []
+            for i in range(1, n + 1):
+                subject, *options = rng.sample(words, 5)
+                blocks.append(f"{i}. Which statement about {subject} matches the {m.group(2)} context?\n"
+                              + "\n".join(f"{letter}) {subject} relates to {opt}" for letter, opt in zip("ABCD", options))
+                              + f"\nCorrect: {rng.choice('ABCD')}")
+            return "\n\n".join(blocks)
+        m = re.search(r"extract the (\d+) most important", prompt)
+        if m:
+            text = prompt.split("Text:", 1)[-1]
+            words = list(dict.fromkeys(w.upper() for w in re.findall(r"\b[A-Za-z]{4,12}\b", text)))
+            return "\n".join(f"{w}|Clue for {w.lower()}" for w in words[:int(m.group(1))])
+        if "JSON array" in prompt:
+            ids = re.findall(r"^ID: (\S+)", prompt, flags=re.M)
+            return json.dumps([{"id": i, "score": 1.0} for i in ids])
+        if "CORRECT or INCORRECT" in prompt:
+            return "CORRECT"
+        if '{"score"' in prompt:
+            return '{"score": 1.0}'
+        return "OK"
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: rate tokens per second, holding at most capacity.
+    """
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1.0) -> None:
+        """
+        Block until tokens are available, then take them.
+        """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                wait = (tokens - self.tokens) / self.rate
+            time.sleep(wait)
+
+class LLMClient:
+    """
+    Shared client around a backend: rate limiting (token bucket over requests
+    per minute), a cap on calls in flight, per-call timeouts and retries with
+    exponential backoff and full jitter on transient errors.
+    """
+
+    def __init__(self, backend: LLMBackend, rpm: float = GEMINI_RPM, burst: int = GEMINI_BURST,
+                 max_concurrency: int = GEMINI_MAX_CONCURRENCY, timeout: float = GEMINI_TIMEOUT,
+                 max_retries: int = GEMINI_MAX_RETRIES, backoff_base: float = 1.0, backoff_max: float = 30.0):
+        self.backend = backend
+        self.bucket = TokenBucket(rpm / 60.0, burst)
+        self.slots = threading.BoundedSemaphore(max(1, max_concurrency))
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+    def _backoff(self, attempt: int) -> None:
+        time.sleep(random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt)))
+
+    def generate(self, prompt: str, generation_config: dict | None = None) -> str:
+        for attempt in range(self.max_retries + 1):
+            self.bucket.acquire()
+            annotate(attempts=1)
+            try:
+                with self.slots:
+                    return self.backend.generate(prompt, generation_config, self.timeout)
+            except transient_errors():
+                if attempt == self.max_retries:
+                    raise
+                self._backoff(attempt)
+
+    def generate_stream(self, prompt: str, generation_config: dict | None = None):
+        """
+        Stream a reply; a transient failure before the first chunk is retried,
+        one after it is raised (the caller already has partial text).
+        """
+        for attempt in range(self.max_retries + 1):
+            self.bucket.acquire()
+            annotate(attempts=1)
+            started = False
+            try:
+                with self.slots:
+                    for text in self.backend.generate_stream(prompt, generation_config, self.timeout):
+                        started = True
+                        yield text
+                return
+            except transient_errors():
+                if started or attempt == self.max_retries:
+                    raise
+                self._backoff(attempt)
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_client() -> LLMClient:
+    """
+    Process-wide LLMClient, built on first use from the GEMINI_* settings.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            backend = FakeBackend() if GEMINI_BACKEND == "fake" else GeminiBackend(GEMINI_MODEL)
+            _client = LLMClient(backend)
+        return _client
+
+def set_client(client: LLMClient | None) -> None:
+    """
+    Replace the shared client (e.g. LLMClient(FakeBackend(latency=0.5)) for a
+    load run); None resets it to the default on next use.
+    """
+    global _client
+    with _client_lock:
+        _client = client
+
+def _cache_key(prompt: str, generation_config: dict | None) -> str:
+    return DiskCache.make_key(GEMINI_MODEL, prompt, generation_config or {})
+
+def _finish_llm_span(record: dict, prompt: str, text: str) -> None:
+    attrs = record["attrs"]
+    attrs["response_chars"] = len(text)
+    if "prompt_tokens" not in attrs:
+        # backend reported no usage (cache hit, fake backend): estimate
+        attrs.update(prompt_tokens=estimate_tokens(prompt), output_tokens=estimate_tokens(text),
+                     tokens_estimated=True)
+
+def gemini_generate(prompt: str, max_output_chars: int = 5000, generation_config: dict | None = None,
+                    use_cache: bool = True, validate=None) -> str:
+    """
+    Send prompt to Gemini (through the shared client) and return plain text response.
+    Replies are cached on disk by hash of (model, prompt, generation_config);
+    pass use_cache=False when a fresh, non-deterministic answer is wanted.
+    If given, validate(reply) must be true for a reply to be cached, so a
+    malformed reply isn't served again from the cache.
+    """
+    use_cache = use_cache and GEMINI_CACHE_ENABLED and GEMINI_BACKEND != "fake"
+    with span("llm.generate", model=GEMINI_MODEL, prompt_chars=len(prompt), stream=False) as record:
+        if use_cache:
+            key = _cache_key(prompt, generation_config)
+            cached = _response_cache.get(key)
+            if cached is not None:
+                record["attrs"]["cache_hit"] = True
+                _finish_llm_span(record, prompt, cached)
+                return cached
+        text = get_client().generate(prompt, generation_config)
+        _finish_llm_span(record, prompt, text)
+    if use_cache and text and (validate is None or validate(text)):
+        _response_cache.set(key, text)
+    return text
+
+def gemini_generate_stream(prompt: str, generation_config: dict | None = None, use_cache: bool = True):
+    """
+    Streaming variant of gemini_generate: yields text chunks as Gemini sends
+    them. A cached reply is yielded in one piece; a completed stream is cached.
+    """
+    use_cache = use_cache and GEMINI_CACHE_ENABLED and GEMINI_BACKEND != "fake"
+    with span("llm.generate", model=GEMINI_MODEL, prompt_chars=len(prompt), stream=True) as record:
+        if use_cache:
+            key = _cache_key(prompt, generation_config)
+            cached = _response_cache.get(key)
+            if cached is not None:
+                record["attrs"]["cache_hit"] = True
+                _finish_llm_span(record, prompt, cached)
+                yield cached
+                return
+        parts = []
+        first = None
+        start = time.perf_counter()
+        for text in get_client().generate_stream(prompt, generation_config):
+            if first is None:
+                first = record["attrs"]["first_chunk_s"] = time.perf_counter() - start
+            parts.append(text)
+            yield text
+        _finish_llm_span(record, prompt, "".join(parts))
+    if use_cache and parts:
+        _response_cache.set(key, "".join(parts))
 
-def gemini_generate(prompt: str, max_output_chars: int = 5000) -> str:
+def gemini_cache_stats() -> dict:
     """
-    Send prompt to Gemini and return plain text response.
-    Uses the google.generativeai SDK's GenerativeModel.generate_content.
+    Hit/miss counters and size of the Gemini response cache.
     """
-    model = genai.GenerativeModel(GEMINI_MODEL)
-    response = model.generate_content(prompt)
-    # response.text should contain the reply for this SDK version
-    return getattr(response, "text", "") or ""
+    return _response_cache.stats()
@@ -0,0 +1,223 @@
+# utils/generation.py
+import os
+import queue
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from .gemini_utils import gemini_generate_stream
+from .parser import format_questions, IncrementalQuestionParser
+from .question_bank import question_text
+from .retrieval import CHARS_PER_TOKEN, split_into_chunks, select_context
+from .telemetry import annotate, bind, span
+
+# Rough size of one context section sent per Gemini call
+CHUNK_TOKENS = 1500
+# Max question-generation calls in flight
+GENERATION_CONCURRENCY = int(os.environ.get("GENERATION_CONCURRENCY", "4"))
+
+def build_question_prompt(num_q: int, q_type: str, difficulty: str, context: str) -> str:
+    return f"""
+You are Igris. Generate exactly {num_q} {q_type} questions of {difficulty} difficulty from the context below.
+Return plain readable questions only, each formatted as:
+1. Question text
+A) option A
+B) option B
+C) option C
+D) option D
+Correct: B
+
+Context:
+{context}
+"""
+
+def select_chunks(chunks: list, max_chunks: int) -> list:
+    """
+    Keep at most max_chunks sections, spread evenly over the document.
+    """
+    if len(chunks) <= max_chunks:
+        return chunks
+    step = len(chunks) / max_chunks
+    return [chunks[int(i * step)] for i in range(max_chunks)]
+
+def allocate_questions(chunks: list, num_q: int) -> list:
+    """
+    Split num_q across chunks in proportion to their length (largest remainder),
+    giving every chunk at least one question when num_q allows it.
+    """
+    if not chunks:
+        return []
+    total = sum(len(c) for c in chunks) or 1
+    shares = [num_q * len(c) / total for c in chunks]
+    counts = [int(s) for s in shares]
+    for i in sorted(range(len(chunks)), key=lambda i: -(shares[i] - counts[i]))[:num_q - sum(counts)]:
+        counts[i] += 1
+    # move questions from the largest allocations to empty chunks
+    for i, n in enumerate(counts):
+        if n == 0:
+            donor = max(range(len(counts)), key=lambda j: counts[j])
+            if counts[donor] > 1:
+                counts[donor] -= 1
+                counts[i] = 1
+    return counts
+
+def _question_signature(question: dict) -> frozenset:
+    # stem plus options, as the question bank compares them: formulaic stems
+    # ("... about osmosis is correct?") differ mostly in their options
+    return frozenset(question_text(question).split())
+
+def _is_duplicate(sig: frozenset, seen: list, threshold: float = 0.8) -> bool:
+    for other in seen:
+        union = len(sig | other)
+        if union and len(sig & other) / union >= threshold:
+            return True
+    return False
+
+def dedupe_questions(questions: list, limit: int | None = None) -> list:
+    """
+    Drop questions whose wording (stem and options) overlaps an earlier one
+    (word Jaccard >= 0.8)
+    and keep at most limit of them.
+    """
+    kept, seen = [], []
+    for q in questions:
+        if limit is not None and len(kept) >= limit:
+            break
+        sig = _question_signature(q)
+        if not q.get("question") or _is_duplicate(sig, seen):
+            continue
+        kept.append(q)
+        seen.append(sig)
+    return kept
+
+# Characters of the source section kept with each generated question
+SOURCE_EXCERPT_CHARS = 200
+
+def iter_question_set(text: str, num_q: int, q_type: str, difficulty: str,
+                      chunk_tokens: int = CHUNK_TOKENS, max_workers: int = GENERATION_CONCURRENCY,
+                      use_cache: bool = True, topic: str | None = None, skip=None):
+    """
+    Map-reduce question generation over the whole document: split text into
+    sections, ask Gemini for a proportional share of the questions per section
+    in parallel, then merge, de-duplicate and trim to num_q.
+    With a topic, only the passages the retrieval index matches to it are used.
+    Yields parsed questions ({id, question, options, answer}, tagged with
+    q_type, source_chunk and source_excerpt) as soon as they are available:
+    every section's reply is streamed and parsed incrementally, so the first
+    question arrives before any call has finished. Ids follow the order yielded.
+    skip(q) -> bool drops questions before they count (e.g. ones already banked).
+    """
+    max_chunks = max(1, num_q)
+    with span("generate.prepare", text_chars=len(text), topic=bool(topic)):
+        if topic:
+            text = select_context(text, max_chunks * chunk_tokens * CHARS_PER_TOKEN, topic)
+        chunks = select_chunks(split_into_chunks(text, chunk_tokens), max_chunks) or [""]
+        annotate(chunks=len(chunks))
+    emitted, seen = [], []
+
+    def tag(q, i):
+        q["q_type"] = q_type
+        q["source_chunk"] = i
+        q["source_excerpt"] = chunks[i][:SOURCE_EXCERPT_CHARS]
+        return q
+
+    def accept(q) -> bool:
+        sig = _question_signature(q)
+        if len(emitted) >= num_q or not q.get("question") or _is_duplicate(sig, seen):
+            return False
+        if skip is not None and skip(q):
+            return False
+        seen.append(sig)
+        emitted.append(q)
+        q["id"] = f"q{len(emitted)}"
+        return True
+
+    counts = allocate_questions(chunks, num_q)
+    jobs = {i: n for i, n in enumerate(counts) if n > 0}
+    # with several sections, ask for one spare each so de-duplication doesn't leave us short
+    spare = 1 if len(jobs) > 1 else 0
+    results = queue.Queue()
+
+    def run(i):
+        # every section streams; questions are handed over as each one completes
+        parser = IncrementalQuestionParser()
+        try:
+            for piece in gemini_generate_stream(build_question_prompt(jobs[i] + spare, q_type, difficulty, chunks[i]),
+                                                use_cache=use_cache):
+                for q in parser.feed(piece):
+                    results.put((i, tag(q, i)))
+            for q in parser.close():
+                results.put((i, tag(q, i)))
+        finally:
+            results.put((i, None))
+
+    spares = []
+    received = dict.fromkeys(jobs, 0)
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        futures = {i: pool.submit(bind(run), i) for i in jobs}
+        running = len(futures)
+        while running:
+            i, q = results.get()
+            if q is None:
+                running -= 1
+                futures[i].result()  # re-raise a failed section's error
+                continue
+            # each section's own share first (keeps coverage proportional), spares after
+            received[i] += 1
+            if received[i] > jobs[i]:
+                spares.append(q)
+            elif accept(q):
+                yield q
+    for q in spares:
+        if accept(q):
+            yield q
+
+def iter_banked_question_set(text: str, num_q: int, q_type: str, difficulty: str, doc_hash: str,
+                             bank=None, serve: bool = True, max_rounds: int = 2, use_cache: bool = True, **kwargs):
+    """
+    iter_question_set backed by the question bank: up to num_q questions for
+    this document, type and difficulty are served from the bank first (when
+    serve is set and no topic narrows the request), only the shortfall is
+    generated, and generated questions that near-duplicate banked ones are
+    dropped. New questions are banked. A second round, bypassing the response
+    cache, tops up when de-duplication leaves the set short.
+    """
+    from .question_bank import get_question_bank
+    bank = bank or get_question_bank()
+    count = 0
+    if serve and not kwargs.get("topic"):
+        with span("bank.draw", doc_hash=doc_hash) as record:
+            served = bank.draw(doc_hash, q_type, difficulty, num_q)
+            record["attrs"]["served"] = len(served)
+        for q in served:
+            count += 1
+            q["id"] = f"q{count}"
+            yield q
+
+    skip = lambda q: bank.is_duplicate(doc_hash, q_type, q)
+    for round_no in range(max_rounds):
+        if count >= num_q:
+            break
+        fresh = []
+        for q in iter_question_set(text, num_q - count, q_type, difficulty, skip=skip,
+                                   use_cache=use_cache and round_no == 0, **kwargs):
+            count += 1
+            q["id"] = f"q{count}"
+            fresh.append(q)
+            yield q
+        bank.add(doc_hash, q_type, difficulty, fresh)
+        if not fresh:
+            break
+
+def generate_question_set(text: str, num_q: int, q_type: str, difficulty: str, **kwargs) -> list:
+    """
+    All questions from iter_question_set, ordered by source section.
+    """
+    questions = sorted(iter_question_set(text, num_q, q_type, difficulty, **kwargs),
+                       key=lambda q: (q["source_chunk"], int(q["id"][1:])))
+    for i, q in enumerate(questions, start=1):
+        q["id"] = f"q{i}"
+    return questions
+
+def generate_questions(text: str, num_q: int, q_type: str, difficulty: str, **kwargs) -> str:
+    """
+    generate_question_set rendered in the plain-text quiz format.
+    """
+    return format_questions(generate_question_set(text, num_q, q_type, difficulty, **kwargs))
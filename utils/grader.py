@@ -1,7 +1,56 @@
+import os
 import re
 import json
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
 from .gemini_utils import gemini_generate
+from .scoring import ShortAnswerScorer, scorer_for
+from .telemetry import annotate, bind, traced
 
+BATCH_SCORE_ITEM_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "id": {"type": "string"},
+        "score": {"type": "number", "minimum": 0},
+    },
+    "required": ["id", "score"],
+}
+BATCH_SCORE_SCHEMA = {"type": "array", "items": {"type": "object"}}
+
+@lru_cache(maxsize=None)
+def _validator(kind: str):
+    from jsonschema import Draft7Validator
+    return Draft7Validator(BATCH_SCORE_ITEM_SCHEMA if kind == "item" else BATCH_SCORE_SCHEMA)
+
+# Max Gemini grading calls in flight per submission
+GRADING_CONCURRENCY = int(os.environ.get("GRADING_CONCURRENCY", "4"))
+
+def option_letter(choice: str) -> str:
+    """
+    Return the option letter ("A".."D") of a rendered choice like "B) Paris",
+    or None if the choice doesn't start with one.
+    """
+    m = re.match(r'^\s*\(?([A-Da-d])[).:]?(?:\s|$)', choice or "")
+    return m.group(1).upper() if m else None
+
+def grade_by_answer_key(question: dict, response: str, max_marks: float = 1.0):
+    """
+    Score an option-based question (MCQ / True-False) locally against its parsed
+    answer key. Returns None when the question has no usable key, so callers can
+    fall back to the AI grader.
+    """
+    key = question.get("answer")
+    if not key:
+        return None
+    if question.get("options"):
+        return max_marks if option_letter(response) == key else 0.0
+    # True/False asked without listed options
+    if key.strip().lower().rstrip(".") in ("true", "false"):
+        given = (response or "").strip().lower().rstrip(".")
+        return max_marks if given == key.strip().lower().rstrip(".") else 0.0
+    return None
+
+@traced("grade.mcq_ai")
 def grade_mcq_by_ai(question_text: str, options: list, student_choice: str) -> float:
     """
     Use Gemini to determine if a selected option is correct.
@@ -21,13 +70,20 @@ Student answer:
 {student_choice}
 """
     out = gemini_generate(prompt)
-    return 1.0 if "CORRECT" in out.upper() else 0.0
+    # "CORRECT" is also a substring of "INCORRECT"
+    return 1.0 if re.match(r"\W*CORRECT\b", out.strip().upper()) else 0.0
 
-def grade_short_answer_by_ai(model_answer: str, student_answer: str, max_marks: float = 1.0) -> float:
+@traced("grade.short_ai")
+def grade_short_answer_by_ai(model_answer: str, student_answer: str, max_marks: float = 1.0,
+                             q_type: str | None = None) -> float:
     """
-    Ask Gemini to return a JSON: {"score": number}
-    Fallback to simple heuristic if parsing fails.
+    Score locally when the answer is clear-cut (see ShortAnswerScorer);
+    otherwise ask Gemini to return a JSON: {"score": number}
+    Fallback to the local score if parsing fails.
     """
+    local, confident = ShortAnswerScorer().score(model_answer, student_answer, max_marks, q_type)
+    if confident:
+        return local
     prompt = f"""
 You are a grader. Given a model answer and student answer, return EXACTLY one JSON object:
 {{"score": number_between_0_and_{max_marks}}}
@@ -38,15 +94,162 @@ Model answer:
 Student answer:
 {student_answer}
 """
-    raw = gemini_generate(prompt)
+    score = _parse_score(gemini_generate(prompt, validate=lambda raw: _parse_score(raw) is not None))
+    return local if score is None else max(0.0, min(score, max_marks))
+
+def _parse_score(raw: str) -> float | None:
+    try:
+        return float(json.loads(raw)["score"])
+    except Exception:
+        return None
+
+def _strip_code_fence(raw: str) -> str:
+    raw = (raw or "").strip()
+    m = re.match(r"^```(?:json)?\s*(.*?)\s*```$", raw, flags=re.S)
+    return m.group(1) if m else raw
+
+def parse_batch_scores(raw: str) -> dict:
+    """
+    Parse a batch grading reply into {id: score}. Entries that fail the schema
+    are dropped so the caller can re-queue just those items.
+    """
     try:
-        parsed = json.loads(raw)
-        score = float(parsed.get("score", 0.0))
-        return max(0.0, min(score, max_marks))
+        data = json.loads(_strip_code_fence(raw))
     except Exception:
-        # fallback heuristic: overlap of keywords
-        key_terms = re.findall(r'\b\w+\b', (model_answer or "").lower())
-        if not key_terms:
-            return 0.0
-        matches = sum(1 for k in set(key_terms) if k in (student_answer or "").lower())
-        return round((matches / max(1, len(set(key_terms)))) * max_marks, 3)
+        m = re.search(r"\[.*\]", raw or "", flags=re.S)
+        if not m:
+            return {}
+        try:
+            data = json.loads(m.group(0))
+        except Exception:
+            return {}
+    if isinstance(data, dict):
+        data = data.get("scores", [])
+    if not _validator("batch").is_valid(data):
+        return {}
+    scores = {}
+    for entry in data:
+        if _validator("item").is_valid(entry):
+            scores[entry["id"]] = float(entry["score"])
+    return scores
+
+def _build_batch_prompt(items: list) -> str:
+    blocks = []
+    for it in items:
+        blocks.append(f"""ID: {it['id']}
+Max marks: {it.get('max_marks', 1.0)}
+Question: {it.get('question') or 'not provided'}
+Model answer: {it.get('model_answer') or 'model answer not provided'}
+Student answer: {it.get('student_answer') or ''}""")
+    return f"""
+You are a grader. Grade every student answer below against its question and model answer.
+Return EXACTLY one JSON array and nothing else, with one object per item:
+[{{"id": "<ID>", "score": number_between_0_and_max_marks}}]
+
+{(chr(10) * 2).join(blocks)}
+"""
+
+@traced("grade.batch")
+def grade_short_answers_batch(items: list, max_rounds: int = 2) -> dict:
+    """
+    Grade many free-text answers (short answer / numerical / coding) with one
+    Gemini call instead of one per answer.
+    items: [{id, question, model_answer, student_answer, max_marks}]; ids must be unique.
+    Items whose score is missing or malformed in the reply are re-sent (up to
+    max_rounds calls in total) and finally given the local ShortAnswerScorer score.
+    Returns {id: score}.
+    """
+    results = {}
+    pending = [it for it in items if it.get("student_answer")]
+    for it in items:
+        if not it.get("student_answer"):
+            results[it["id"]] = 0.0
+    for round_no in range(max_rounds):
+        if not pending:
+            break
+        ids = {it["id"] for it in pending}
+        # replies missing a score aren't cached, and re-sends always go to Gemini
+        raw = gemini_generate(_build_batch_prompt(pending), use_cache=round_no == 0,
+                              validate=lambda r: ids <= parse_batch_scores(r).keys())
+        scores = parse_batch_scores(raw)
+        retry = []
+        for it in pending:
+            if it["id"] in scores:
+                max_marks = it.get("max_marks", 1.0)
+                results[it["id"]] = max(0.0, min(scores[it["id"]], max_marks))
+            else:
+                retry.append(it)
+        pending = retry
+    scorer = scorer_for(tuple(it.get("model_answer") or "" for it in items))
+    for it in pending:
+        results[it["id"]] = scorer.score(it.get("model_answer"), it.get("student_answer"),
+                                         it.get("max_marks", 1.0), it.get("q_type"))[0]
+    return results
+
+
+@traced("grade.submission")
+def grade_submission(questions: list, answers: dict, max_marks: float = 1.0,
+                     max_workers: int = GRADING_CONCURRENCY, on_progress=None) -> list:
+    """
+    Grade every question of one submission and return the scores in question order.
+    Answer-key questions and clear-cut free-text answers are scored inline;
+    key-less MCQs are sent to Gemini concurrently (at most max_workers at once)
+    and the remaining free-text answers go out as one batch call alongside them,
+    so wall-clock time is roughly the slowest single call.
+    on_progress(done, total) is called from the calling thread.
+    """
+    scores = [None] * len(questions)
+    free_text, mcqs = [], []
+    for i, q in enumerate(questions):
+        score = grade_by_answer_key(q, answers.get(q["id"], ""), max_marks=max_marks)
+        if score is not None:
+            scores[i] = score
+        elif q.get("options"):
+            mcqs.append(i)
+        else:
+            free_text.append(i)
+    if free_text:
+        # clear-cut answers (numerical within tolerance, near-verbatim, clear misses)
+        # are scored in-process; only the rest go to Gemini
+        scorer = scorer_for(tuple(questions[i].get("answer") or "" for i in free_text))
+        escalate = []
+        for i in free_text:
+            q = questions[i]
+            score, confident = scorer.score(q.get("answer"), answers.get(q["id"], ""), max_marks, q.get("q_type"))
+            if confident:
+                scores[i] = score
+            else:
+                escalate.append(i)
+        free_text = escalate
+
+    jobs = {}
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        if free_text:
+            # the batch call is the slowest; submitted first so it never waits
+            # behind the MCQ calls for a worker
+            items = [{"id": questions[i]["id"], "question": questions[i]["question"],
+                      "model_answer": questions[i].get("answer"), "q_type": questions[i].get("q_type"),
+                      "student_answer": answers.get(questions[i]["id"], ""), "max_marks": max_marks}
+                     for i in free_text]
+            jobs[pool.submit(bind(grade_short_answers_batch), items)] = free_text
+        for i in mcqs:
+            q = questions[i]
+            jobs[pool.submit(bind(grade_mcq_by_ai), q["question"], q["options"], answers.get(q["id"], ""))] = [i]
+
+        done = len(questions) - sum(len(idxs) for idxs in jobs.values())
+        annotate(questions=len(questions), local=done, free_text=len(free_text))
+        if on_progress:
+            on_progress(done, len(questions))
+        for fut in as_completed(jobs):
+            idxs = jobs[fut]
+            result = fut.result()
+            if isinstance(result, dict):
+                for i in idxs:
+                    scores[i] = result.get(questions[i]["id"], 0.0)
+            else:
+                # grade_mcq_by_ai returns 1.0 / 0.0
+                scores[idxs[0]] = result * max_marks
+            done += len(idxs)
+            if on_progress:
+                on_progress(done, len(questions))
+    return scores
@@ -0,0 +1,150 @@
+"""
+Headless bulk ingestion: generate and save an assignment for every PDF / DOCX /
+PPTX in a folder, in the same format as the Teacher tab's Save & Assign.
+
+    python -m utils.ingest LECTURES_DIR --q-type MCQ --num-q 10 --difficulty Medium \
+        --batch DS-2024-B1 [--topic T] [--variants N] [--out assignments] [--recursive]
+
+Extraction runs in a process pool and generation in a bounded thread pool
+(each document's Gemini calls are further capped by GEMINI_MAX_CONCURRENCY).
+Progress is recorded in the catalog as each assignment is saved, so rerunning
+the same command after an interruption skips documents already done.
+"""
+import os
+import sys
+import argparse
+from pathlib import Path
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from .cache import DiskCache
+from .catalog import (AssignmentCatalog, new_assignment_meta, save_crossword_assignment,
+                      save_question_assignment)
+from .extract_text import SUPPORTED_TYPES, extract_text_from_path, file_sha256
+from .gemini_utils import configure_gemini
+from .question_bank import QuestionBank
+
+# Documents generating at once
+INGEST_LLM_WORKERS = int(os.environ.get("INGEST_LLM_WORKERS", "4"))
+Q_TYPES = ["MCQ", "True/False", "Short Answer", "Numerical", "Coding", "Crossword"]
+
+def find_documents(folder, recursive: bool = False) -> list:
+    pattern = "**/*" if recursive else "*"
+    return sorted(p for p in Path(folder).glob(pattern)
+                  if p.is_file() and p.suffix.lower().lstrip(".") in SUPPORTED_TYPES)
+
+def _generate(text: str, doc_hash: str, q_type: str, num_q: int, difficulty: str, topic: str | None,
+              bank: QuestionBank, fresh: bool):
+    if q_type == "Crossword":
+        from .crossword import build_crossword_from_text
+        return build_crossword_from_text(text, num_words=num_q, topic=topic)
+    from .generation import iter_banked_question_set
+    return list(iter_banked_question_set(text, num_q, q_type, difficulty, doc_hash=doc_hash, bank=bank,
+                                         serve=not fresh, use_cache=not fresh, topic=topic))
+
+def ingest(folder, out_folder, q_type: str, num_q: int, difficulty: str, batch: str,
+           topic: str | None = None, variants: int = 1, recursive: bool = False, fresh: bool = False,
+           extract_workers: int | None = None, llm_workers: int = INGEST_LLM_WORKERS, log=print) -> dict:
+    """
+    Generate and save assignments for every supported document under folder.
+    Questions come from the folder's question bank where it already has them
+    for a document, unless fresh is set.
+    Returns counts of saved, skipped (already done) and failed documents, and
+    of saved ones with fewer questions than num_q (short).
+    """
+    out_folder = Path(out_folder)
+    out_folder.mkdir(parents=True, exist_ok=True)
+    catalog = AssignmentCatalog(out_folder / "catalog.db")
+    catalog.import_folder(out_folder)
+    bank = QuestionBank(out_folder / "question_bank.db")
+    settings = DiskCache.make_key(q_type, num_q, difficulty, batch, topic, variants)
+
+    summary = {"saved": 0, "skipped": 0, "failed": 0, "short": 0}
+    pending = []
+    for path in find_documents(folder, recursive):
+        # keyed by content, so renamed or moved files are not generated twice
+        digest = file_sha256(str(path))
+        state_key = f"ingest:{digest}:{settings}"
+        if catalog.get_state(state_key):
+            summary["skipped"] += 1
+        else:
+            pending.append((path, digest, state_key))
+    log(f"{len(pending)} to generate, {summary['skipped']} already done")
+
+    with ProcessPoolExecutor(max_workers=extract_workers) as procs, \
+            ThreadPoolExecutor(max_workers=max(1, llm_workers)) as threads:
+        extracting = {procs.submit(extract_text_from_path, str(item[0])): item for item in pending}
+        generating = {}
+        running = set(extracting)
+        while running:
+            finished, running = wait(running, return_when=FIRST_COMPLETED)
+            for fut in finished:
+                if fut in extracting:
+                    path, digest, state_key = extracting[fut]
+                    try:
+                        text = fut.result()
+                        if not text.strip():
+                            raise ValueError("no text extracted")
+                    except Exception as exc:
+                        summary["failed"] += 1
+                        log(f"FAILED {path.name}: {exc}")
+                        continue
+                    job = threads.submit(_generate, text, digest, q_type, num_q, difficulty, topic, bank, fresh)
+                    generating[job] = (path, state_key)
+                    running.add(job)
+                    continue
+
+                path, state_key = generating[fut]
+                try:
+                    result = fut.result()
+                    if q_type == "Crossword":
+                        meta = new_assignment_meta(batch, q_type, len(result["placed"]), difficulty, path.name)
+                        out_path, layouts = save_crossword_assignment(catalog, out_folder, meta, result, variants)
+                        if layouts < variants:
+                            log(f"  {path.name}: only {layouts} of {variants} distinct layouts")
+                        if result["unused"]:
+                            log(f"  {path.name}: {len(result['unused'])} word(s) didn't fit: {', '.join(result['unused'])}")
+                    else:
+                        meta = new_assignment_meta(batch, q_type, len(result), difficulty, path.name)
+                        out_path, errors, missing = save_question_assignment(catalog, out_folder, meta, result)
+                        if errors:
+                            raise ValueError("generated questions did not validate: " + "; ".join(errors[:3]))
+                        if missing:
+                            log(f"  {path.name}: no answer key for {', '.join(missing)}")
+                        if len(result) < num_q:
+                            summary["short"] += 1
+                            log(f"  {path.name}: only {len(result)} of {num_q} questions "
+                                "(the rest repeated banked ones or didn't parse)")
+                except Exception as exc:
+                    summary["failed"] += 1
+                    log(f"FAILED {path.name}: {exc}")
+                    continue
+                catalog.set_state(state_key, meta["id"])
+                summary["saved"] += 1
+                log(f"[{summary['saved'] + summary['failed']}/{len(pending)}] {path.name} -> {out_path.name}")
+    return summary
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("folder", help="folder of .pdf / .docx / .pptx files")
+    ap.add_argument("--q-type", choices=Q_TYPES, default="MCQ")
+    ap.add_argument("--num-q", type=int, default=8, help="questions (or crossword words) per document")
+    ap.add_argument("--difficulty", choices=["Easy", "Medium", "Hard"], default="Medium")
+    ap.add_argument("--batch", required=True, help="batch the assignments are assigned to")
+    ap.add_argument("--topic", help="only use passages matching this topic")
+    ap.add_argument("--variants", type=int, default=1, help="crossword layouts per assignment")
+    ap.add_argument("--out", default="assignments", help="assignments folder used by the app")
+    ap.add_argument("--recursive", action="store_true", help="include sub-folders")
+    ap.add_argument("--fresh", action="store_true", help="don't reuse banked questions or cached replies")
+    ap.add_argument("--extract-workers", type=int, help="extraction processes (default: CPU count)")
+    ap.add_argument("--llm-workers", type=int, default=INGEST_LLM_WORKERS, help="documents generating at once")
+    args = ap.parse_args(argv)
+
+    configure_gemini()
+    summary = ingest(args.folder, args.out, args.q_type, args.num_q, args.difficulty, args.batch,
+                     topic=args.topic, variants=args.variants, recursive=args.recursive, fresh=args.fresh,
+                     extract_workers=args.extract_workers, llm_workers=args.llm_workers)
+    print(f"saved {summary['saved']} ({summary['short']} short), skipped {summary['skipped']}, "
+          f"failed {summary['failed']}")
+    return 1 if summary["failed"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,202 @@
+# utils/jobs.py
+import os
+import json
+import time
+import uuid
+import hashlib
+import sqlite3
+import threading
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from .telemetry import profiled, span
+
+# Generation jobs running at once per process (shared by every session)
+JOB_WORKERS = int(os.environ.get("GENERATION_JOB_WORKERS", "2"))
+# Finished jobs (and their uploads) older than this are pruned at startup
+JOB_RETENTION_SECONDS = float(os.environ.get("GENERATION_JOB_RETENTION", str(7 * 24 * 3600)))
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+ACTIVE_STATUSES = (QUEUED, RUNNING)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    status TEXT NOT NULL,
+    params TEXT NOT NULL,
+    blob TEXT,
+    result TEXT,
+    error TEXT,
+    progress REAL NOT NULL DEFAULT 0,
+    created REAL NOT NULL,
+    started REAL,
+    finished REAL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created);
+"""
+
+class JobQueue:
+    """
+    SQLite-backed job store with a bounded thread pool. Jobs are enqueued
+    with JSON params (plus an optional uploaded file), run by the handler
+    registered for their kind, and polled by id; status, partial results and
+    the final result live in the database so they survive Streamlit reruns
+    and page reloads. Jobs left running by a previous process are re-queued.
+
+    A handler is called as handler(params, blob_path, update) and returns a
+    JSON-serialisable result; update(progress=None, partial=None) records
+    progress (0..1) and a partial result while it runs.
+    """
+
+    def __init__(self, db_path, handlers: dict, max_workers: int = JOB_WORKERS):
+        self.db_path = str(db_path)
+        self.blob_dir = Path(self.db_path).parent / "job_uploads"
+        self.blob_dir.mkdir(parents=True, exist_ok=True)
+        self.handlers = handlers
+        self._pool = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="igris-job")
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            conn.execute("UPDATE jobs SET status = ?, started = NULL WHERE status = ?", (QUEUED, RUNNING))
+        self.prune()
+        for job_id in self._ids(QUEUED):
+            self._pool.submit(self._run, job_id)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _execute(self, sql: str, params: tuple = ()) -> int:
+        conn = self._connect()
+        try:
+            with conn:
+                return conn.execute(sql, params).rowcount
+        finally:
+            conn.close()
+
+    def _ids(self, status: str) -> list:
+        conn = self._connect()
+        try:
+            return [r["id"] for r in conn.execute("SELECT id FROM jobs WHERE status = ? ORDER BY created", (status,))]
+        finally:
+            conn.close()
+
+    def submit(self, kind: str, params: dict, blob: bytes | None = None, blob_suffix: str = "") -> str:
+        """
+        Enqueue a job and return its id. blob (e.g. the uploaded document) is
+        stored next to the database and handed to the handler as a path.
+        """
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        job_id = uuid.uuid4().hex
+        blob_path = None
+        if blob is not None:
+            blob_path = self.blob_dir / f"{job_id}{blob_suffix}"
+            blob_path.write_bytes(blob)
+        self._execute("INSERT INTO jobs (id, kind, status, params, blob, created) VALUES (?, ?, ?, ?, ?, ?)",
+                      (job_id, kind, QUEUED, json.dumps(params), str(blob_path) if blob_path else None, time.time()))
+        self._pool.submit(self._run, job_id)
+        return job_id
+
+    def get(self, job_id: str) -> dict | None:
+        """
+        Job as a dict (params/result decoded), or None if unknown.
+        """
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        finally:
+            conn.close()
+        if row is None:
+            return None
+        job = dict(row)
+        job["params"] = json.loads(job["params"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def counts(self) -> dict:
+        """
+        Number of jobs per status.
+        """
+        conn = self._connect()
+        try:
+            return {r["status"]: r["n"] for r in conn.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status")}
+        finally:
+            conn.close()
+
+    def prune(self, older_than: float = JOB_RETENTION_SECONDS) -> int:
+        """
+        Delete finished jobs older than older_than seconds.
+        """
+        cutoff = time.time() - older_than
+        conn = self._connect()
+        try:
+            with conn:
+                rows = conn.execute("SELECT id, blob FROM jobs WHERE status IN (?, ?) AND finished < ?",
+                                    (DONE, FAILED, cutoff)).fetchall()
+                conn.executemany("DELETE FROM jobs WHERE id = ?", [(r["id"],) for r in rows])
+        finally:
+            conn.close()
+        for r in rows:
+            if r["blob"]:
+                Path(r["blob"]).unlink(missing_ok=True)
+        return len(rows)
+
+    def _run(self, job_id: str) -> None:
+        # claim the job; another process sharing the database may have taken it
+        if not self._execute("UPDATE jobs SET status = ?, started = ? WHERE id = ? AND status = ?",
+                             (RUNNING, time.time(), job_id, QUEUED)):
+            return
+        job = self.get(job_id)
+        lock = threading.Lock()
+
+        def update(progress: float | None = None, partial=None) -> None:
+            with lock:
+                if progress is not None:
+                    self._execute("UPDATE jobs SET progress = ? WHERE id = ?", (min(1.0, progress), job_id))
+                if partial is not None:
+                    self._execute("UPDATE jobs SET result = ? WHERE id = ?", (json.dumps(partial), job_id))
+
+        try:
+            with span(f"job.{job['kind']}", job_id=job_id), profiled(f"job-{job['kind']}"):
+                result = self.handlers[job["kind"]](job["params"], job["blob"], update)
+        except Exception as exc:
+            self._execute("UPDATE jobs SET status = ?, error = ?, finished = ? WHERE id = ?",
+                          (FAILED, f"{type(exc).__name__}: {exc}", time.time(), job_id))
+        else:
+            self._execute("UPDATE jobs SET status = ?, result = ?, progress = 1, finished = ? WHERE id = ?",
+                          (DONE, json.dumps(result), time.time(), job_id))
+        if job["blob"]:
+            Path(job["blob"]).unlink(missing_ok=True)
+
+def run_generation_job(params: dict, blob_path: str, update) -> dict:
+    """
+    Handler for "generate" jobs: extract the uploaded document and build a
+    crossword or a question set. Questions are published as partial results
+    as soon as each one is parsed; the result records the requested count
+    alongside them, since a set can come back short.
+    """
+    from .extract_text import extract_text_from_bytes
+    # the stored upload is only there so the job survives a restart; parse it
+    # from memory, typed by MIME / content rather than by file name
+    data = Path(blob_path).read_bytes()
+    text = extract_text_from_bytes(data, mime=params.get("mime"))
+    update(progress=0.05)
+    if params["q_type"] == "Crossword":
+        from .crossword import build_crossword_from_text
+        cw = build_crossword_from_text(text, num_words=params["num_q"], topic=params.get("topic"))
+        return {"crossword": cw}
+
+    from .generation import iter_banked_question_set
+    questions = []
+    # served from the question bank where possible; new questions are banked
+    for q in iter_banked_question_set(text, params["num_q"], params["q_type"], params["difficulty"],
+                                      doc_hash=hashlib.sha256(data).hexdigest(), serve=params.get("use_cache", True),
+                                      use_cache=params.get("use_cache", True), topic=params.get("topic")):
+        questions.append(q)
+        update(progress=0.05 + 0.95 * len(questions) / params["num_q"], partial={"questions": questions})
+    # fewer than asked when the rest only repeated banked questions or didn't parse
+    return {"questions": questions, "requested": params["num_q"]}
+
+GENERATION_HANDLERS = {"generate": run_generation_job}
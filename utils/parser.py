@@ -1,4 +1,46 @@
 import re
+from functools import lru_cache
+from .telemetry import traced
+
+QUESTION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "id": {"type": "string"},
+        "question": {"type": "string", "minLength": 1},
+        "options": {"type": ["array", "null"], "items": {"type": "string"}, "minItems": 2},
+        "answer": {"type": ["string", "null"]},
+        "q_type": {"type": "string"},
+        "source_chunk": {"type": ["integer", "null"]},
+        "source_excerpt": {"type": ["string", "null"]},
+    },
+    "required": ["id", "question", "options", "answer"],
+}
+ASSIGNMENT_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "meta": {"type": "object", "required": ["id"]},
+        "questions": {"type": "array", "minItems": 1, "items": QUESTION_SCHEMA},
+    },
+    "required": ["meta", "questions"],
+}
+
+@lru_cache(maxsize=1)
+def _assignment_validator():
+    # jsonschema is only needed when saving/loading, not at app start
+    from jsonschema import Draft7Validator
+    return Draft7Validator(ASSIGNMENT_SCHEMA)
+
+ANSWER_LINE_RE = re.compile(
+    r"[ \t]*\n?[ \t]*\**(?:Correct(?: [Aa]nswer| [Oo]ption)?|CORRECT(?: ANSWER)?|Answer|ANSWER)\**\s*:\**[ \t]*([^\n]*)\n?"
+)
+ANSWER_LETTER_RE = re.compile(r"^\(?([A-D])(?:[).:](?:\s|$)|\s*$)")
+
+def _canonical_answer_line(m) -> str:
+    value = m.group(1).strip()
+    lm = ANSWER_LETTER_RE.match(value)
+    if lm:
+        value = lm.group(1)
+    return f"\nCorrect: {value}\n"
 
 def normalize_inline_options(text: str) -> str:
     """
@@ -10,8 +52,10 @@ def normalize_inline_options(text: str) -> str:
 
     # Remove leading boilerplate like "Here are 10 MCQ questions"
     text = re.sub(r"(?i)here are.*?questions.*?:", "", text)
-    # Remove explicit "(Correct: ...)" fragments to avoid duplication in parsing
-    text = re.sub(r"\(Correct:.*?\)", "", text, flags=re.S)
+    # Move answer-key fragments ("(Correct: B)", "Answer: B) ...") onto their own
+    # canonical "Correct: ..." line so they don't get split as options
+    text = re.sub(r"\((?:Correct|Answer):(.*?)\)", r"Correct:\1\n", text, flags=re.S)
+    text = ANSWER_LINE_RE.sub(_canonical_answer_line, text)
 
     # Make sure A) B) C) D) start on their own line
     text = re.sub(r"(?<!\n)\s+([A-D]\))", r"\n\1", text)
@@ -35,6 +79,38 @@ def split_question_blocks(text: str) -> list:
     # fallback: split on double newlines
     return [blk.strip() for blk in text.split("\n\n") if blk.strip()]
 
+def extract_answer(block: str) -> tuple:
+    """
+    Pull the "Correct: ..." line out of a question block.
+    Returns (block_without_answer_line, answer_text_or_None).
+    """
+    m = re.search(r"^Correct:[ \t]*(.*)$", block, flags=re.M)
+    if not m:
+        return block, None
+    answer = m.group(1).strip() or None
+    block = (block[:m.start()] + block[m.end():]).strip()
+    return block, answer
+
+def resolve_answer_key(answer: str, options: list) -> str:
+    """
+    Map a raw answer to an option letter ("A".."D") when the question has options,
+    accepting either the letter itself or the option text (e.g. "True").
+    Questions without options keep the answer text as their model answer.
+    """
+    if not answer:
+        return None
+    if not options:
+        return answer
+    m = ANSWER_LETTER_RE.match(answer)
+    if m:
+        return m.group(1)
+    wanted = re.sub(r"\s+", " ", answer).strip().lower().rstrip(".")
+    for opt in options:
+        letter, _, body = opt.partition(") ")
+        if body.strip().lower().rstrip(".") == wanted:
+            return letter
+    return None
+
 def extract_question_and_options(block: str) -> tuple:
     """
     Given a text block, extract the question text and a list of options (if any).
@@ -59,18 +135,168 @@ def extract_question_and_options(block: str) -> tuple:
                 options.append(f"{letter} {body}")
     return question_text, options or None
 
+@traced("parse")
 def parse_questions(plain_text: str) -> list:
     """
     Parse raw plain-text quiz into a structured list of questions:
-    [{id, question, options}].
+    [{id, question, options, answer}].
+    "answer" is the option letter for option-based questions, the model answer
+    text for free-text questions, or None when the output carried no key.
     """
     blocks = split_question_blocks(plain_text)
     parsed = []
     for i, blk in enumerate(blocks, start=1):
+        blk, raw_answer = extract_answer(blk)
         q_text, opts = extract_question_and_options(blk)
         parsed.append({
             "id": f"q{i}",
             "question": q_text,
-            "options": opts
+            "options": opts,
+            "answer": resolve_answer_key(raw_answer, opts)
         })
     return parsed
+
+def format_questions(questions: list) -> str:
+    """
+    Render parsed questions back into the plain-text quiz format that
+    parse_questions reads (numbered, A)-D) options, "Correct: X" line).
+    """
+    blocks = []
+    for i, q in enumerate(questions, start=1):
+        lines = [f"{i}. {q['question']}"]
+        lines.extend(q.get("options") or [])
+        if q.get("answer"):
+            lines.append(f"Correct: {q['answer']}")
+        blocks.append("\n".join(lines))
+    return "\n\n".join(blocks)
+
+# Single-pass tokenizer for the quiz format: every marker the multi-pass
+# normalizer looks for, in one alternation scanned once with finditer.
+_QUIZ_TOKEN_RE = re.compile(r"""
+    (?P<paren>\((?:Correct|Answer):(?P<pval>(?s:.*?))\))
+  | (?P<ans>\**(?:Correct(?:\ [Aa]nswer|\ [Oo]ption)?|CORRECT(?:\ ANSWER)?|Answer|ANSWER)\**\s*:\**[ \t]*(?P<aval>[^\n]*))
+  | (?P<q>^[ \t]*\d+\.\s)
+  | (?P<opt>(?P<letter>[A-D])\))
+""", re.X | re.M)
+_WS_RE = re.compile(r"\s+")
+
+@traced("parse.fast")
+def parse_questions_fast(plain_text: str) -> list:
+    """
+    Single-pass equivalent of parse_questions for numbered output ("1. ...").
+    Used to convert legacy .txt assignments; falls back to parse_questions
+    when the text has no numbered questions.
+    """
+    text = plain_text or ""
+    questions = []
+    current = None
+    target = None  # list collecting text for the question or the current option
+    pos = 0
+
+    def flush_text(upto):
+        if target is not None:
+            target.append(text[pos:upto])
+
+    for m in _QUIZ_TOKEN_RE.finditer(text):
+        kind = "paren" if m.group("paren") else "ans" if m.group("ans") else "q" if m.group("q") else "opt"
+        if current is None and kind != "q":
+            continue
+        flush_text(m.start())
+        pos = m.end()
+        if kind == "q":
+            current = {"text": [], "options": [], "answer": None}
+            questions.append(current)
+            target = current["text"]
+        elif kind == "opt":
+            current["options"].append((m.group("letter"), []))
+            target = current["options"][-1][1]
+        else:
+            value = (m.group("pval") if kind == "paren" else m.group("aval")).strip()
+            lm = ANSWER_LETTER_RE.match(value)
+            current["answer"] = lm.group(1) if lm else (value or None)
+            target = None
+    flush_text(len(text))
+
+    if not questions:
+        return parse_questions(plain_text)
+
+    parsed = []
+    for i, q in enumerate(questions, start=1):
+        lines = [re.sub(r"[ \t]+", " ", ln).strip() for ln in "".join(q["text"]).splitlines()]
+        q_text = "\n".join(ln for ln in lines if ln)
+        opts = [f"{letter}) {_WS_RE.sub(' ', ''.join(body).strip())}" for letter, body in q["options"]] or None
+        parsed.append({
+            "id": f"q{i}",
+            "question": q_text,
+            "options": opts,
+            "answer": resolve_answer_key(q["answer"], opts)
+        })
+    return parsed
+
+def validate_assignment(obj: dict) -> list:
+    """
+    Check a structured assignment ({meta, questions}) against ASSIGNMENT_SCHEMA.
+    Returns human-readable error messages (empty when valid).
+    """
+    errors = []
+    for err in sorted(_assignment_validator().iter_errors(obj), key=lambda e: list(e.path)):
+        where = "/".join(str(p) for p in err.path) or "assignment"
+        errors.append(f"{where}: {err.message}")
+    return errors
+
+def missing_answer_keys(questions: list) -> list:
+    """
+    Ids of option-based questions that have no answer key.
+    """
+    return [q["id"] for q in questions if q.get("options") and not q.get("answer")]
+
+_QUESTION_START_RE = re.compile(r"^[ \t]*\d+\.\s", re.M)
+_ANSWER_DONE_RE = re.compile(r"^\**(?:Correct|CORRECT|Answer|ANSWER)[^\n]*:[^\n]*\n", re.M)
+
+class IncrementalQuestionParser:
+    """
+    Parse a quiz while it streams in. feed() takes the next text chunk and
+    returns the questions completed by it: a question is complete once its
+    answer line has ended or the next question has started. close() returns
+    whatever is left. Question ids run q1, q2, ... across the whole stream.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.count = 0
+
+    def _emit(self, block: str) -> list:
+        out = []
+        for q in parse_questions_fast(block):
+            if not q["question"]:
+                continue
+            self.count += 1
+            q["id"] = f"q{self.count}"
+            out.append(q)
+        return out
+
+    def feed(self, chunk: str) -> list:
+        self.buffer += chunk or ""
+        out = []
+        while True:
+            starts = [m.start() for m in _QUESTION_START_RE.finditer(self.buffer)]
+            if not starts:
+                # wait for the first numbered question; any preamble is skipped
+                return out
+            first = starts[0]
+            answer = _ANSWER_DONE_RE.search(self.buffer, first)
+            end = None
+            if answer and (len(starts) < 2 or answer.end() <= starts[1]):
+                end = answer.end()
+            elif len(starts) > 1:
+                end = starts[1]
+            if end is None:
+                return out
+            out.extend(self._emit(self.buffer[first:end]))
+            self.buffer = self.buffer[end:]
+
+    def close(self) -> list:
+        block, self.buffer = self.buffer, ""
+        if not _QUESTION_START_RE.search(block):
+            return []
+        return self._emit(block)
@@ -0,0 +1,198 @@
+# utils/question_bank.py
+import os
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from pathlib import Path
+import numpy as np
+
+# Default bank, next to the app's assignments catalog
+QUESTION_BANK_PATH = os.environ.get("QUESTION_BANK_PATH", "assignments/question_bank.db")
+
+# MinHash over character shingles; LSH with BANDS bands of ROWS rows each.
+# 16 x 4 makes pairs with Jaccard >= 0.7 candidates ~99% of the time.
+SHINGLE_CHARS = 4
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+# Estimated Jaccard similarity at which two questions count as the same question
+NEAR_DUP_THRESHOLD = float(os.environ.get("QUESTION_BANK_DUP_THRESHOLD", "0.7"))
+
+_PRIME = (1 << 31) - 1
+_rng = np.random.default_rng(20240601)
+_PERM_A = _rng.integers(1, _PRIME, NUM_PERM, dtype=np.uint64)
+_PERM_B = _rng.integers(0, _PRIME, NUM_PERM, dtype=np.uint64)
+_NORM_RE = re.compile(r"[^a-z0-9]+")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS questions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    doc_hash TEXT NOT NULL,
+    q_type TEXT NOT NULL,
+    difficulty TEXT NOT NULL,
+    question TEXT NOT NULL,
+    minhash BLOB NOT NULL,
+    times_served INTEGER NOT NULL DEFAULT 0,
+    created REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_questions_source ON questions (doc_hash, q_type, difficulty, times_served);
+CREATE TABLE IF NOT EXISTS lsh_buckets (
+    band INTEGER NOT NULL,
+    bucket INTEGER NOT NULL,
+    question_id INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_lsh_bucket ON lsh_buckets (band, bucket);
+"""
+
+def question_text(q: dict) -> str:
+    """
+    Normalised text a question is compared on: stem plus options.
+    """
+    text = " ".join([q.get("question") or ""] + list(q.get("options") or []))
+    return _NORM_RE.sub(" ", text.lower()).strip()
+
+def minhash(text: str) -> np.ndarray:
+    """
+    NUM_PERM-value MinHash signature of the character shingles of text.
+    """
+    if len(text) <= SHINGLE_CHARS:
+        shingles = {text}
+    else:
+        shingles = {text[i:i + SHINGLE_CHARS] for i in range(len(text) - SHINGLE_CHARS + 1)}
+    base = np.fromiter(
+        (int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=4).digest(), "little") % _PRIME
+         for s in shingles),
+        dtype=np.uint64, count=len(shingles))
+    return ((np.outer(base, _PERM_A) + _PERM_B) % _PRIME).min(axis=0).astype(np.uint32)
+
+def _band_buckets(signature: np.ndarray) -> list:
+    # 56-bit band hashes fit SQLite's signed INTEGER
+    return [int.from_bytes(hashlib.blake2b(signature[b * ROWS:(b + 1) * ROWS].tobytes(), digest_size=7).digest(), "little")
+            for b in range(BANDS)]
+
+def similarity(a: np.ndarray, b: np.ndarray) -> float:
+    """
+    Estimated Jaccard similarity of two MinHash signatures.
+    """
+    return float(np.mean(a == b))
+
+class QuestionBank:
+    """
+    Persistent store of generated questions, indexed by source document hash,
+    question type and difficulty, with a MinHash LSH index so near-duplicates
+    of questions already banked for the same document and type are found
+    without comparing against every stored question.
+    """
+
+    def __init__(self, db_path=QUESTION_BANK_PATH):
+        self.db_path = str(db_path)
+        Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    @staticmethod
+    def _find_duplicate(conn, doc_hash: str, q_type: str, signature: np.ndarray) -> int | None:
+        buckets = _band_buckets(signature)
+        clause = " OR ".join("(b.band = ? AND b.bucket = ?)" for _ in buckets)
+        params = [v for pair in enumerate(buckets) for v in pair]
+        rows = conn.execute(
+            f"SELECT DISTINCT q.id, q.minhash FROM lsh_buckets b JOIN questions q ON q.id = b.question_id "
+            f"WHERE ({clause}) AND q.doc_hash = ? AND q.q_type = ?", params + [doc_hash, q_type]).fetchall()
+        for row in rows:
+            if similarity(signature, np.frombuffer(row["minhash"], dtype=np.uint32)) >= NEAR_DUP_THRESHOLD:
+                return row["id"]
+        return None
+
+    def is_duplicate(self, doc_hash: str, q_type: str, question: dict) -> bool:
+        """
+        True if a near-duplicate of question is banked for this document and type.
+        """
+        conn = self._connect()
+        try:
+            return self._find_duplicate(conn, doc_hash, q_type, minhash(question_text(question))) is not None
+        finally:
+            conn.close()
+
+    def add(self, doc_hash: str, q_type: str, difficulty: str, questions: list) -> int:
+        """
+        Bank the questions that are not near-duplicates of stored ones (or of
+        each other); returns how many were added.
+        """
+        added = 0
+        with self._lock:
+            conn = self._connect()
+            try:
+                with conn:
+                    for q in questions:
+                        signature = minhash(question_text(q))
+                        if self._find_duplicate(conn, doc_hash, q_type, signature) is not None:
+                            continue
+                        stored = {k: v for k, v in q.items() if k != "id"}
+                        cur = conn.execute(
+                            "INSERT INTO questions (doc_hash, q_type, difficulty, question, minhash, times_served, created) "
+                            "VALUES (?, ?, ?, ?, ?, 1, ?)",
+                            (doc_hash, q_type, difficulty, json.dumps(stored), signature.tobytes(), time.time()))
+                        conn.executemany("INSERT INTO lsh_buckets VALUES (?, ?, ?)",
+                                         [(b, bucket, cur.lastrowid) for b, bucket in enumerate(_band_buckets(signature))])
+                        added += 1
+            finally:
+                conn.close()
+        return added
+
+    def draw(self, doc_hash: str, q_type: str, difficulty: str, n: int) -> list:
+        """
+        Up to n banked questions for this document, type and difficulty,
+        least-served first (so repeated requests rotate through the bank),
+        and count them as served.
+        """
+        if n <= 0:
+            return []
+        with self._lock:
+            conn = self._connect()
+            try:
+                with conn:
+                    rows = conn.execute(
+                        "SELECT id, question FROM questions WHERE doc_hash = ? AND q_type = ? AND difficulty = ? "
+                        "ORDER BY times_served, RANDOM() LIMIT ?", (doc_hash, q_type, difficulty, n)).fetchall()
+                    conn.executemany("UPDATE questions SET times_served = times_served + 1 WHERE id = ?",
+                                     [(r["id"],) for r in rows])
+            finally:
+                conn.close()
+        return [json.loads(r["question"]) for r in rows]
+
+    def count(self, doc_hash: str, q_type: str | None = None, difficulty: str | None = None) -> int:
+        sql, params = "SELECT COUNT(*) FROM questions WHERE doc_hash = ?", [doc_hash]
+        if q_type:
+            sql += " AND q_type = ?"
+            params.append(q_type)
+        if difficulty:
+            sql += " AND difficulty = ?"
+            params.append(difficulty)
+        conn = self._connect()
+        try:
+            return conn.execute(sql, params).fetchone()[0]
+        finally:
+            conn.close()
+
+_bank = None
+_bank_lock = threading.Lock()
+
+def get_question_bank() -> QuestionBank:
+    """
+    Process-wide bank at QUESTION_BANK_PATH.
+    """
+    global _bank
+    with _bank_lock:
+        if _bank is None:
+            _bank = QuestionBank(QUESTION_BANK_PATH)
+        return _bank
@@ -0,0 +1,215 @@
+# utils/results.py
+import json
+import math
+import time
+import uuid
+import sqlite3
+from pathlib import Path
+
+# Score distribution buckets: 0-10%, 10-20%, ..., 90-100%
+NUM_BUCKETS = 10
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT UNIQUE NOT NULL,
+    assignment_id TEXT NOT NULL,
+    batch TEXT,
+    student TEXT,
+    score REAL NOT NULL,
+    total REAL NOT NULL,
+    question_scores TEXT,
+    extra TEXT,
+    created REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_results_assignment ON results (assignment_id, seq);
+CREATE INDEX IF NOT EXISTS idx_results_student ON results (student, seq);
+CREATE INDEX IF NOT EXISTS idx_results_batch ON results (batch, seq);
+CREATE TABLE IF NOT EXISTS assignment_stats (
+    assignment_id TEXT PRIMARY KEY,
+    attempts INTEGER NOT NULL,
+    sum_frac REAL NOT NULL,
+    sum_sq_frac REAL NOT NULL,
+    min_frac REAL NOT NULL,
+    max_frac REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS score_buckets (
+    assignment_id TEXT NOT NULL,
+    bucket INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (assignment_id, bucket)
+);
+CREATE TABLE IF NOT EXISTS results_state (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS question_stats (
+    assignment_id TEXT NOT NULL,
+    qid TEXT NOT NULL,
+    attempts INTEGER NOT NULL,
+    score_sum REAL NOT NULL,
+    max_sum REAL NOT NULL,
+    PRIMARY KEY (assignment_id, qid)
+);
+"""
+
+def _bucket(fraction: float) -> int:
+    return min(NUM_BUCKETS - 1, max(0, int(fraction * NUM_BUCKETS)))
+
+def _assignment_id(file_name: str) -> str:
+    # "assignment_<id>.txt" / ".json" / ".crossword.json" -> "<id>"
+    name = Path(file_name).name
+    name = name[len("assignment_"):] if name.startswith("assignment_") else name
+    return name.split(".", 1)[0]
+
+class ResultsStore:
+    """
+    Append-only log of graded submissions (rows are only ever inserted) with
+    per-assignment aggregates updated in the same transaction as each insert,
+    so summaries are a primary-key lookup instead of a scan over results.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = str(db_path)
+        Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def record_result(self, assignment_id: str, score: float, total: float, batch: str | None = None,
+                      student: str | None = None, question_scores: dict | None = None,
+                      max_marks: dict | None = None, extra: dict | None = None) -> str:
+        """
+        Append one graded submission and fold it into the aggregates.
+        question_scores maps question id -> marks obtained; max_marks maps
+        question id -> marks available (1.0 when missing).
+        Returns the result id.
+        """
+        rid = uuid.uuid4().hex
+        conn = self._connect()
+        try:
+            with conn:
+                self._insert(conn, rid, assignment_id, score, total, batch, student,
+                             question_scores or {}, max_marks or {}, extra, time.time())
+        finally:
+            conn.close()
+        return rid
+
+    @staticmethod
+    def _insert(conn, rid: str, assignment_id: str, score: float, total: float, batch, student,
+                question_scores: dict, max_marks: dict, extra, created: float) -> bool:
+        # False (and no aggregate update) when a result with this id exists
+        frac = score / total if total else 0.0
+        if not conn.execute(
+                "INSERT OR IGNORE INTO results (id, assignment_id, batch, student, score, total, question_scores, extra, created) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (rid, assignment_id, batch, student, score, total,
+                 json.dumps(question_scores), json.dumps(extra or {}), created)).rowcount:
+            return False
+        conn.execute(
+            "INSERT INTO assignment_stats VALUES (?, 1, ?, ?, ?, ?) "
+            "ON CONFLICT(assignment_id) DO UPDATE SET attempts = attempts + 1, "
+            "sum_frac = sum_frac + excluded.sum_frac, sum_sq_frac = sum_sq_frac + excluded.sum_sq_frac, "
+            "min_frac = MIN(min_frac, excluded.min_frac), max_frac = MAX(max_frac, excluded.max_frac)",
+            (assignment_id, frac, frac * frac, frac, frac))
+        conn.execute(
+            "INSERT INTO score_buckets VALUES (?, ?, 1) "
+            "ON CONFLICT(assignment_id, bucket) DO UPDATE SET count = count + 1",
+            (assignment_id, _bucket(frac)))
+        conn.executemany(
+            "INSERT INTO question_stats VALUES (?, ?, 1, ?, ?) "
+            "ON CONFLICT(assignment_id, qid) DO UPDATE SET attempts = attempts + 1, "
+            "score_sum = score_sum + excluded.score_sum, max_sum = max_sum + excluded.max_sum",
+            [(assignment_id, qid, float(s), float(max_marks.get(qid, 1.0)))
+             for qid, s in question_scores.items()])
+        return True
+
+    def import_folder(self, folder, batch_of=None) -> int:
+        """
+        One-time import of result_<id>.json files saved before the store
+        existed. batch_of(assignment_id) supplies the batch they lacked.
+        Returns the number of results added (0 once the folder has been imported).
+        """
+        folder = Path(folder)
+        state_key = f"imported:{folder.resolve()}"
+        conn = self._connect()
+        try:
+            if conn.execute("SELECT 1 FROM results_state WHERE key = ?", (state_key,)).fetchone():
+                return 0
+            added = 0
+            with conn:
+                for path in sorted(folder.glob("result_*.json")):
+                    try:
+                        obj = json.loads(path.read_text(encoding="utf-8"))
+                        aid = _assignment_id(obj["assignment"])
+                        if "total_cells" in obj:
+                            score, total = float(obj["correct_cells"]), float(obj["total_cells"])
+                            extra = {"correct_cells": obj["correct_cells"], "total_cells": obj["total_cells"]}
+                        else:
+                            score, total, extra = float(obj["score"]), float(obj["total"]), None
+                    except (OSError, ValueError, KeyError, TypeError):
+                        continue
+                    rid = obj.get("id") or path.stem[len("result_"):]
+                    added += self._insert(conn, rid, aid, score, total, batch_of(aid) if batch_of else None,
+                                          None, {}, {}, extra, path.stat().st_mtime)
+                conn.execute("INSERT INTO results_state VALUES (?, ?)", (state_key, str(time.time())))
+            return added
+        finally:
+            conn.close()
+
+    def assignment_summary(self, assignment_id: str) -> dict:
+        """
+        Aggregates for one assignment:
+        {attempts, mean, stdev, min, max, distribution: [count per 10% bucket],
+         questions: {qid: correctness rate}} (fractions of the total, 0..1).
+        """
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT * FROM assignment_stats WHERE assignment_id = ?", (assignment_id,)).fetchone()
+            if row is None:
+                return {"attempts": 0, "mean": None, "stdev": None, "min": None, "max": None,
+                        "distribution": [0] * NUM_BUCKETS, "questions": {}}
+            distribution = [0] * NUM_BUCKETS
+            for b in conn.execute("SELECT bucket, count FROM score_buckets WHERE assignment_id = ?", (assignment_id,)):
+                distribution[b["bucket"]] = b["count"]
+            questions = {q["qid"]: (q["score_sum"] / q["max_sum"] if q["max_sum"] else 0.0)
+                         for q in conn.execute("SELECT qid, score_sum, max_sum FROM question_stats WHERE assignment_id = ?",
+                                               (assignment_id,))}
+        finally:
+            conn.close()
+        n = row["attempts"]
+        mean = row["sum_frac"] / n
+        variance = max(0.0, row["sum_sq_frac"] / n - mean * mean)
+        return {"attempts": n, "mean": mean, "stdev": math.sqrt(variance),
+                "min": row["min_frac"], "max": row["max_frac"],
+                "distribution": distribution, "questions": questions}
+
+    def list_results(self, assignment_id: str | None = None, student: str | None = None,
+                     batch: str | None = None, limit: int = 100, offset: int = 0) -> list:
+        """
+        Newest-first page of raw results, optionally filtered.
+        """
+        clauses, params = [], []
+        for column, value in (("assignment_id", assignment_id), ("student", student), ("batch", batch)):
+            if value:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        conn = self._connect()
+        try:
+            rows = conn.execute(f"SELECT * FROM results {where} ORDER BY seq DESC LIMIT ? OFFSET ?",
+                                params + [limit, offset]).fetchall()
+        finally:
+            conn.close()
+        out = []
+        for row in rows:
+            item = dict(row)
+            item["question_scores"] = json.loads(item["question_scores"] or "{}")
+            item["extra"] = json.loads(item["extra"] or "{}")
+            out.append(item)
+        return out
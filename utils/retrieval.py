@@ -0,0 +1,131 @@
+# utils/retrieval.py
+import re
+from collections import Counter
+from functools import lru_cache
+import numpy as np
+
+CHARS_PER_TOKEN = 4
+# Passage size used by the retrieval index
+PASSAGE_TOKENS = 200
+
+STOPWORDS = frozenset("""
+a an and are as at be been but by can do does for from had has have he her his how i if in into is it its
+may more most not of on or our she so such than that the their them then there these they this those to
+was we were what when where which while who why will with would you your also each other only over
+""".split())
+
+def tokenize(text: str) -> list:
+    return [t for t in re.findall(r"[a-z0-9]+", (text or "").lower()) if len(t) > 1 and t not in STOPWORDS]
+
+def split_into_chunks(text: str, chunk_tokens: int) -> list:
+    """
+    Split text into sections of about chunk_tokens tokens, breaking on
+    paragraph boundaries (a single oversized paragraph is hard-split).
+    """
+    max_chars = chunk_tokens * CHARS_PER_TOKEN
+    chunks = []
+    current = []
+    size = 0
+    for para in re.split(r"\n\s*\n", text or ""):
+        para = para.strip()
+        if not para:
+            continue
+        while len(para) > max_chars:
+            cut = para.rfind(" ", 0, max_chars)
+            cut = cut if cut > max_chars // 2 else max_chars
+            para_head, para = para[:cut].strip(), para[cut:].strip()
+            if current:
+                chunks.append("\n\n".join(current))
+                current, size = [], 0
+            chunks.append(para_head)
+        if current and size + len(para) + 2 > max_chars:
+            chunks.append("\n\n".join(current))
+            current, size = [], 0
+        current.append(para)
+        size += len(para) + 2
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+class PassageIndex:
+    """
+    In-process BM25 index over the passages of one document.
+    Postings are stored as flat NumPy arrays (one entry per passage/term pair)
+    with the BM25 weight precomputed, so scoring a query is one isin + bincount.
+    """
+
+    def __init__(self, text: str, passage_tokens: int = PASSAGE_TOKENS, k1: float = 1.5, b: float = 0.75):
+        self.passages = split_into_chunks(text, passage_tokens)
+        vocab = {}
+        doc_ids, term_ids, tfs = [], [], []
+        doc_len = np.zeros(len(self.passages), dtype=np.float64)
+        for d, passage in enumerate(self.passages):
+            counts = Counter(tokenize(passage))
+            doc_len[d] = sum(counts.values())
+            for term, tf in counts.items():
+                doc_ids.append(d)
+                term_ids.append(vocab.setdefault(term, len(vocab)))
+                tfs.append(tf)
+        self.vocab = vocab
+        self.doc_ids = np.asarray(doc_ids, dtype=np.int32)
+        self.term_ids = np.asarray(term_ids, dtype=np.int32)
+        tf = np.asarray(tfs, dtype=np.float64)
+
+        n = len(self.passages)
+        df = np.bincount(self.term_ids, minlength=len(vocab))
+        self.idf = np.log1p((n - df + 0.5) / (df + 0.5))
+        avgdl = doc_len.mean() if n else 0.0
+        norm = k1 * (1 - b + b * doc_len[self.doc_ids] / (avgdl or 1.0))
+        self.weights = self.idf[self.term_ids] * tf * (k1 + 1) / (tf + norm)
+
+        # query-independent informativeness: BM25 mass per distinct term count
+        distinct = np.bincount(self.doc_ids, minlength=n)
+        self.informativeness = np.bincount(self.doc_ids, weights=self.weights, minlength=n) / np.sqrt(np.maximum(distinct, 1))
+
+    def score(self, query: str) -> np.ndarray:
+        """
+        BM25 score of every passage for query.
+        """
+        q_ids = [self.vocab[t] for t in set(tokenize(query)) if t in self.vocab]
+        if not q_ids:
+            return np.zeros(len(self.passages))
+        mask = np.isin(self.term_ids, q_ids)
+        return np.bincount(self.doc_ids[mask], weights=self.weights[mask], minlength=len(self.passages))
+
+    def select(self, budget_chars: int, topic: str | None = None) -> str:
+        """
+        Fill budget_chars with the best passages (topic matches when a topic is
+        given and matches anything, otherwise the most informative ones),
+        returned in document order.
+        """
+        scores = self.score(topic) if topic else None
+        if scores is None or not scores.any():
+            scores = self.informativeness
+        chosen = []
+        used = 0
+        for d in np.argsort(-scores, kind="stable"):
+            if scores[d] <= 0 and chosen:
+                break
+            size = len(self.passages[d]) + 2
+            if used + size > budget_chars:
+                continue
+            chosen.append(d)
+            used += size
+        return "\n\n".join(self.passages[d] for d in sorted(chosen))
+
+@lru_cache(maxsize=8)
+def get_index(text: str) -> PassageIndex:
+    """
+    Index for text, built once per document and reused across calls.
+    """
+    return PassageIndex(text)
+
+def select_context(text: str, budget_chars: int, topic: str | None = None) -> str:
+    """
+    Prompt context of at most budget_chars from text. Without a topic, texts
+    that already fit pass through untouched.
+    """
+    text = text or ""
+    if not topic and len(text) <= budget_chars:
+        return text
+    return get_index(text).select(budget_chars, topic)
@@ -0,0 +1,175 @@
+# utils/scoring.py
+import os
+import re
+import math
+from collections import Counter
+from functools import lru_cache
+from .retrieval import STOPWORDS
+
+# Blended similarity at or above which an answer gets full marks without Gemini
+CONFIDENT_MATCH = float(os.environ.get("LOCAL_SCORE_MATCH", "0.8"))
+# ... and at or below which a short factual answer gets zero without Gemini
+CONFIDENT_MISS = float(os.environ.get("LOCAL_SCORE_MISS", "0.2"))
+# Model answers with at most this many content terms count as short factual answers
+SHORT_ANSWER_TERMS = 4
+# Relative tolerance for numerical answers (plus a tiny absolute one for zero)
+NUMERIC_REL_TOL = float(os.environ.get("NUMERIC_REL_TOL", "0.01"))
+NUMERIC_ABS_TOL = 1e-9
+
+_NUMBER = r"(?:\d+(?:,\d{3})*(?:\.\d*)?|\.\d+)(?:[eE][-+]?\d+)?"
+# a number, optionally a fraction ("3/4") or a percentage ("75%")
+NUMBER_RE = re.compile(rf"([-+]?{_NUMBER})(?:\s*/\s*({_NUMBER}))?(\s*%)?")
+
+# Kept as terms (retrieval drops them): "not X" must not score like "X"
+NEGATIONS = frozenset({"not", "no", "never", "nor", "none", "cannot"})
+_SCORER_STOPWORDS = STOPWORDS - NEGATIONS
+_NOT_RE = re.compile(r"n['\u2019]t\b")
+
+# suffix -> replacement, longest first; a light Porter-style stemmer
+_SUFFIXES = (
+    ("ational", "ate"), ("ization", "ize"), ("fulness", "ful"), ("iveness", "ive"),
+    ("ations", "ate"), ("ation", "ate"), ("ments", ""), ("ment", ""), ("ness", ""),
+    ("ingly", ""), ("edly", ""), ("ities", "ity"), ("ies", "y"), ("sses", "ss"),
+    ("ing", ""), ("ers", "er"), ("ed", ""), ("ly", ""), ("es", "e"), ("s", ""),
+)
+
+@lru_cache(maxsize=65536)
+def stem(word: str) -> str:
+    """
+    Strip common English suffixes ("reduces", "reduced", "reducing" -> "reduc").
+    Words of four letters or fewer are left alone.
+    """
+    if len(word) <= 4 or word.isdigit():
+        return word
+    for suffix, repl in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            word = word[:-len(suffix)] + repl
+            break
+    # "reduce" and "reduc(ed)" should meet
+    return word[:-1] if word.endswith("e") and len(word) > 4 else word
+
+def tokenize(text: str) -> list:
+    """
+    retrieval.tokenize, but negations are kept ("isn't" -> "is", "not").
+    """
+    text = _NOT_RE.sub(" not", (text or "").lower())
+    return [t for t in re.findall(r"[a-z0-9]+", text) if len(t) > 1 and t not in _SCORER_STOPWORDS]
+
+def terms(text: str) -> Counter:
+    """
+    Stemmed content-term counts of text (stopwords dropped, negations kept).
+    """
+    return Counter(stem(t) for t in tokenize(text))
+
+def negated(text: str) -> bool:
+    return any(t in NEGATIONS for t in tokenize(text))
+
+def parse_numbers(text: str) -> list:
+    """
+    Numbers in text; "3/4" reads as 0.75 and "75%" as 0.75.
+    """
+    values = []
+    for num, denom, percent in NUMBER_RE.findall(text or ""):
+        try:
+            value = float(num.replace(",", ""))
+            if denom:
+                value /= float(denom.replace(",", ""))
+        except (ValueError, ZeroDivisionError):
+            continue
+        values.append(value / 100 if percent else value)
+    return values
+
+def numbers_match(expected: float, given: float, rel_tol: float = NUMERIC_REL_TOL) -> bool:
+    return math.isclose(expected, given, rel_tol=rel_tol, abs_tol=NUMERIC_ABS_TOL)
+
+class ShortAnswerScorer:
+    """
+    In-process scorer for free-text answers against stored model answers.
+    IDF weights come from the model answers it is built with (typically one
+    assignment's), so terms shared by every answer count for less. score()
+    returns (score, confident); callers escalate unconfident ones to Gemini.
+    """
+
+    def __init__(self, model_answers=()):
+        docs = [set(terms(a)) for a in model_answers if a]
+        df = Counter(t for d in docs for t in d)
+        self.n_docs = len(docs)
+        self.df = df
+
+    def idf(self, term: str) -> float:
+        # smoothed; unseen terms get the highest weight
+        return math.log((1 + self.n_docs) / (1 + self.df.get(term, 0))) + 1.0
+
+    def _vector(self, counts: Counter) -> dict:
+        return {t: (1 + math.log(c)) * self.idf(t) for t, c in counts.items()}
+
+    def similarity(self, model_answer: str, student_answer: str) -> float:
+        """
+        Blend of TF-IDF cosine and IDF-weighted coverage of the model answer's
+        terms (recall), in 0..1.
+        """
+        model_vec = self._vector(_model_terms(model_answer))
+        if not model_vec:
+            return 0.0
+        student_vec = self._vector(terms(student_answer))
+        dot = sum(w * student_vec.get(t, 0.0) for t, w in model_vec.items())
+        norm = math.sqrt(sum(w * w for w in model_vec.values())) * math.sqrt(sum(w * w for w in student_vec.values()))
+        cosine = dot / norm if norm else 0.0
+        coverage = sum(w for t, w in model_vec.items() if t in student_vec) / sum(model_vec.values())
+        return 0.5 * cosine + 0.5 * coverage
+
+    def score(self, model_answer: str | None, student_answer: str | None, max_marks: float = 1.0,
+              q_type: str | None = None) -> tuple:
+        """
+        (score, confident) for one answer. Confident cases: empty answers,
+        numerical answers the student gave a number for, near-verbatim matches,
+        and clear misses on short factual answers that still share a term
+        with the model answer (no shared term may be a paraphrase). Answers
+        whose negation differs from the model answer's are never confident.
+        Everything else returns the blended similarity as a provisional score
+        with confident=False.
+        """
+        if not (student_answer or "").strip():
+            return 0.0, True
+        if not (model_answer or "").strip():
+            return 0.0, False
+
+        # numerical: the first number in the model answer is the value ("9.8 m/s^2")
+        expected = _model_numbers(model_answer)
+        if expected and (q_type == "Numerical" or (len(expected) == 1 and not _model_terms(model_answer))):
+            given = parse_numbers(student_answer)
+            if not given:
+                return 0.0, False
+            if not any(numbers_match(expected[0], g) for g in given):
+                # "75%" vs "75" is a unit question, not a clear miss
+                return 0.0, "%" not in model_answer + student_answer
+            # a hit among many numbers (working shown, or hedging) is left to Gemini
+            return max_marks, len(given) <= len(expected) + 1
+
+        sim = self.similarity(model_answer, student_answer)
+        provisional = round(sim * max_marks, 3), False
+        if negated(model_answer) != negated(student_answer):
+            return provisional
+        if sim >= CONFIDENT_MATCH:
+            return max_marks, True
+        model_terms = _model_terms(model_answer)
+        if (sim <= CONFIDENT_MISS and len(model_terms) <= SHORT_ANSWER_TERMS
+                and set(model_terms) & set(terms(student_answer))):
+            return 0.0, True
+        return provisional
+
+@lru_cache(maxsize=4096)
+def _model_terms(model_answer: str) -> Counter:
+    # model answers repeat for every submission of an assignment
+    return terms(model_answer)
+
+@lru_cache(maxsize=4096)
+def _model_numbers(model_answer: str) -> list:
+    return parse_numbers(model_answer)
+
+@lru_cache(maxsize=256)
+def scorer_for(model_answers: tuple) -> ShortAnswerScorer:
+    """
+    Shared scorer for one assignment's model answers.
+    """
+    return ShortAnswerScorer(model_answers)
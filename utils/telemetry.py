@@ -0,0 +1,247 @@
+# utils/telemetry.py
+import os
+import json
+import time
+import atexit
+import cProfile
+import functools
+import tempfile
+import threading
+import contextlib
+from pathlib import Path
+
+# JSONL trace of every finished span (one object per line); empty disables it
+TRACE_FILE = os.environ.get("IGRIS_TRACE_FILE", "")
+# Prometheus text-format metrics, rewritten at most every METRICS_INTERVAL seconds
+METRICS_FILE = os.environ.get("IGRIS_METRICS_FILE", "")
+METRICS_INTERVAL = float(os.environ.get("IGRIS_METRICS_INTERVAL", "5"))
+# Folder for cProfile dumps of profiled() blocks; empty disables profiling
+PROFILE_DIR = os.environ.get("IGRIS_PROFILE_DIR", "")
+
+# Upper bounds (seconds) of the stage duration histogram
+DURATION_BUCKETS = (0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Span attributes summed into counters: attribute -> metric name
+COUNTED_ATTRS = {
+    "prompt_chars": "igris_llm_prompt_chars_total",
+    "response_chars": "igris_llm_response_chars_total",
+    "prompt_tokens": "igris_llm_prompt_tokens_total",
+    "output_tokens": "igris_llm_output_tokens_total",
+    "attempts": "igris_llm_attempts_total",
+}
+
+_local = threading.local()
+_lock = threading.Lock()
+_trace_fh = None
+_metrics_written = 0.0
+_metrics_lock = threading.Lock()
+_profile_lock = threading.Lock()
+
+# stage -> [bucket counts..., +Inf count, sum]; (metric, stage) -> value
+_histograms = {}
+_counters = {}
+
+def _stack() -> list:
+    if not hasattr(_local, "stack"):
+        _local.stack = []
+    return _local.stack
+
+def _new_id() -> str:
+    return os.urandom(8).hex()
+
+def current_span() -> dict | None:
+    """
+    Innermost open span on this thread, or None.
+    """
+    stack = _stack()
+    return stack[-1] if stack else None
+
+def annotate(**attrs) -> None:
+    """
+    Add attributes (sizes, token counts, cache hits, ...) to the current span.
+    Numeric values under an existing key are added rather than replaced.
+    """
+    span = current_span()
+    if span is None:
+        return
+    for key, value in attrs.items():
+        if isinstance(value, (int, float)) and not isinstance(value, bool) and isinstance(span["attrs"].get(key), (int, float)):
+            span["attrs"][key] += value
+        else:
+            span["attrs"][key] = value
+
+@contextlib.contextmanager
+def span(name: str, **attrs):
+    """
+    Time a block as a named stage. Nested spans on the same thread share the
+    trace id of the outermost one. Finished spans feed the duration histogram
+    and counters, and are appended to TRACE_FILE when set.
+    """
+    stack = _stack()
+    parent = stack[-1] if stack else None
+    record = {
+        "name": name,
+        "trace_id": parent["trace_id"] if parent else _new_id(),
+        "span_id": _new_id(),
+        "parent_id": parent["span_id"] if parent else None,
+        "thread": threading.current_thread().name,
+        "start": time.time(),
+        "attrs": dict(attrs),
+    }
+    stack.append(record)
+    start = time.perf_counter()
+    error = None
+    try:
+        yield record
+    except BaseException as exc:
+        error = type(exc).__name__
+        raise
+    finally:
+        record["duration_s"] = time.perf_counter() - start
+        if error and error != "GeneratorExit":
+            record["error"] = error
+        # remove by identity: a suspended generator may leave spans above ours
+        for i in range(len(stack) - 1, -1, -1):
+            if stack[i] is record:
+                del stack[i]
+                break
+        _finish(record)
+
+def bind(fn):
+    """
+    Wrap fn so spans it opens on another thread (e.g. in a ThreadPoolExecutor)
+    are children of the span current where bind() was called.
+    """
+    parent = current_span()
+    if parent is None:
+        return fn
+
+    @functools.wraps(fn)
+    def inner(*args, **kwargs):
+        stack = _stack()
+        stack.append(parent)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            stack.remove(parent)
+    return inner
+
+def traced(name: str):
+    """
+    Decorator form of span() for a whole function call.
+    """
+    def wrap(fn):
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return inner
+    return wrap
+
+def _finish(record: dict) -> None:
+    global _trace_fh
+    name = record["name"]
+    with _lock:
+        hist = _histograms.setdefault(name, [0] * (len(DURATION_BUCKETS) + 2))
+        for i, bound in enumerate(DURATION_BUCKETS):
+            if record["duration_s"] <= bound:
+                hist[i] += 1
+        hist[-2] += 1
+        hist[-1] += record["duration_s"]
+        if "error" in record:
+            key = ("igris_stage_errors_total", name)
+            _counters[key] = _counters.get(key, 0) + 1
+        for attr, metric in COUNTED_ATTRS.items():
+            value = record["attrs"].get(attr)
+            if isinstance(value, (int, float)):
+                _counters[(metric, name)] = _counters.get((metric, name), 0) + value
+        if record["attrs"].get("cache_hit"):
+            key = ("igris_cache_hits_total", name)
+            _counters[key] = _counters.get(key, 0) + 1
+        if TRACE_FILE:
+            if _trace_fh is None:
+                Path(TRACE_FILE).parent.mkdir(parents=True, exist_ok=True)
+                _trace_fh = open(TRACE_FILE, "a", encoding="utf-8")
+            _trace_fh.write(json.dumps(record, default=str) + "\n")
+            _trace_fh.flush()
+    if METRICS_FILE and record["parent_id"] is None and time.time() - _metrics_written >= METRICS_INTERVAL:
+        write_metrics()
+
+def metrics_text() -> str:
+    """
+    All metrics in the Prometheus text exposition format.
+    """
+    lines = [
+        "# HELP igris_stage_duration_seconds Wall time per instrumented stage.",
+        "# TYPE igris_stage_duration_seconds histogram",
+    ]
+    with _lock:
+        for name, hist in sorted(_histograms.items()):
+            for bound, count in zip(DURATION_BUCKETS, hist):
+                lines.append(f'igris_stage_duration_seconds_bucket{{stage="{name}",le="{bound}"}} {count}')
+            lines.append(f'igris_stage_duration_seconds_bucket{{stage="{name}",le="+Inf"}} {hist[-2]}')
+            lines.append(f'igris_stage_duration_seconds_count{{stage="{name}"}} {hist[-2]}')
+            lines.append(f'igris_stage_duration_seconds_sum{{stage="{name}"}} {hist[-1]:.6f}')
+        metrics = sorted({metric for metric, _ in _counters})
+        for metric in metrics:
+            lines.append(f"# TYPE {metric} counter")
+            for (m, name), value in sorted(_counters.items()):
+                if m == metric:
+                    lines.append(f'{metric}{{stage="{name}"}} {value}')
+    return "\n".join(lines) + "\n"
+
+def write_metrics(path: str | None = None) -> None:
+    """
+    Atomically rewrite the metrics file (METRICS_FILE unless path is given).
+    Best-effort: I/O errors are swallowed so metrics never fail a traced call.
+    """
+    global _metrics_written
+    path = path or METRICS_FILE
+    if not path:
+        return
+    target = Path(path)
+    with _metrics_lock:
+        _metrics_written = time.time()
+        tmp = None
+        try:
+            target.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=target.parent, prefix=target.name + ".", suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(metrics_text())
+            os.replace(tmp, target)
+        except OSError:
+            if tmp:
+                Path(tmp).unlink(missing_ok=True)
+
+def reset_metrics() -> None:
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
+
+@contextlib.contextmanager
+def profiled(name: str):
+    """
+    Run the block under cProfile when IGRIS_PROFILE_DIR is set and dump the
+    stats to <dir>/<name>-<timestamp>.prof (open with pstats or snakeviz).
+    """
+    # only one profiler can run at a time; nested or concurrent blocks run unprofiled
+    if not PROFILE_DIR or not _profile_lock.acquire(blocking=False):
+        yield
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        _profile_lock.release()
+        Path(PROFILE_DIR).mkdir(parents=True, exist_ok=True)
+        profiler.dump_stats(str(Path(PROFILE_DIR) / f"{name}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}.prof"))
+
+def estimate_tokens(text: str) -> int:
+    """
+    Rough token count (~4 characters per token) when the API reports none.
+    """
+    return (len(text) + 3) // 4
+
+atexit.register(write_metrics)